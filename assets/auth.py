@@ -1,43 +1,14 @@
 import streamlit as st
 import json
 import os
-import pandas as pd
-import assets.sidebar
+from . import users
 
-USER_DATA_FILE = "user/users.csv"
+USER_DATA_FILE = users.USER_DB
 
 def load_user_data():
+    """Open the indexed user store (importing user/users.csv on first run) and return its connection."""
     os.makedirs("user", exist_ok=True)
-
-    expected_columns = ["username", "email", "password"]
-
-    # If the file does not exist → create a fresh CSV with headers
-    if not os.path.isfile(USER_DATA_FILE):
-        df = pd.DataFrame(columns=expected_columns)
-        df.to_csv(USER_DATA_FILE, index=False)
-        return df
-
-    try:
-        df = pd.read_csv(USER_DATA_FILE)
-
-        # If CSV exists but is empty → reset to expected schema
-        if df.empty or df.shape[1] == 0:
-            df = pd.DataFrame(columns=expected_columns)
-            df.to_csv(USER_DATA_FILE, index=False)
-            return df
-
-        # Ensure all expected columns are present
-        for col in expected_columns:
-            if col not in df.columns:
-                df[col] = ""
-
-        return df
-
-    except pd.errors.EmptyDataError:
-        # If CSV exists but is totally empty (no headers)
-        df = pd.DataFrame(columns=expected_columns)
-        df.to_csv(USER_DATA_FILE, index=False)
-        return df
+    return users.get_connection()
 
 # Load Lottie animation from file
 def load_lottiefile(filepath):
@@ -120,7 +91,6 @@ def render_background_style():
 
 # ---------------------- SIGN UP PAGE ----------------------
 def render_signup(user_data):
-    user_data = load_user_data()
     render_background_style()
     st.markdown("<h1 style='text-align:center;color:white;font-size:2.5rem;'>🤖 Welcome to Nexa AI</h1>", unsafe_allow_html=True)
     st.markdown("<h2 style='text-align:center;color:white;'>🔐 Create Your Nexa Account</h2>", unsafe_allow_html=True)
@@ -139,22 +109,21 @@ def render_signup(user_data):
     if st.button("Sign Up"):
         if not username.strip() or not email.strip() or not password.strip():
             st.error("🚫 All fields are required!")
-        elif username in user_data["username"].values:
+        elif users.username_exists(username):
             st.error("🚫 Username already taken. Please choose another.")
         else:
-            new_user = pd.DataFrame({
-                "username": [username],
-                "email": [email],
-                "password": [password]  # Add hashing for production!
-            })
-            user_data = pd.concat([user_data, new_user], ignore_index=True)
-            user_data.to_csv(USER_DATA_FILE, index=False)
-            st.success("✅ Account created! You can now log in.")
-            st.session_state.page_option = "Login"
+            # The insert itself enforces uniqueness, so a concurrent sign-up cannot slip through
+            taken = users.create_user(username, email, password)
+            if taken == "username":
+                st.error("🚫 Username already taken. Please choose another.")
+            elif taken == "email":
+                st.error("🚫 An account with this email already exists.")
+            else:
+                st.success("✅ Account created! You can now log in.")
+                st.session_state.page_option = "Login"
 
     st.markdown("<div class='footer'>© 2025 Nexa AI</div>", unsafe_allow_html=True)
 def render_login(user_data):
-    user_data = load_user_data()
     render_background_style()
     st.markdown("<h1 style='text-align:center;color:white;font-size:2.5rem;'>🤖 Welcome to Nexa AI</h1>", unsafe_allow_html=True)
     st.markdown("<h2 style='text-align:center; color:white;'>🔑 Login to Nexa</h2>", unsafe_allow_html=True)
@@ -171,17 +140,17 @@ def render_login(user_data):
         if login_input.strip() == "" or password.strip() == "":
             st.error("All fields are required!")
         else:
-            # Match by either username or email
-            user_row = user_data[(user_data['email'] == login_input) | (user_data['username'] == login_input)]
+            # Match by either username or email (indexed lookups)
+            user_row = users.find_user(login_input)
 
-            if user_row.empty:
+            if user_row is None:
                 st.error("Username or Email not found. Please sign up first.")
-            elif user_row['password'].values[0] != password:
+            elif user_row['password'] != password:
                 st.error("Incorrect password.")
             else:
-                st.session_state.logged_in_user = user_row['email'].values[0] 
-                st.session_state.logged_in_user_email = user_row['email'].values[0]
-                st.session_state.logged_in_username = user_row['username'].values[0]
+                st.session_state.logged_in_user = user_row['email']
+                st.session_state.logged_in_user_email = user_row['email']
+                st.session_state.logged_in_username = user_row['username']
                 st.success(f"✅ Welcome To Nexa AI!")
                 st.session_state.page_option = "Chat with Bot"
                 st.rerun()
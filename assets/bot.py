@@ -1,18 +1,37 @@
 import streamlit as st
-from streamlit_lottie import st_lottie
-from langchain_core.messages import AIMessage, HumanMessage
-from .custom_responses import CUSTOM_RESPONSES #
+from .matcher import find_custom_response
+from .chat_records import ChatRecord, USER, from_stored, role_of, to_langchain, to_stored
+from .response_cache import get_response_cache, record_answer_source
+from . import storage
+from . import cache
+from .config import env_flag, env_int
+from .context_window import build_context, count_tokens, message_tokens
+from .streaming import stream_visible_text, strip_think
+from .write_behind import get_history_writer, flush_history_writes
+from .dispatcher import DispatcherBusy
+from . import metrics
+from .profiling import profiled
 import os
 import json
-import hashlib
 import datetime
+import time
+import itertools
+import functools
 import uuid
 import re
 
 # Constants
-HISTORY_FILE = "archived/chats_history/history.json"
+HISTORY_FILE = storage.HISTORY_DB
 LOTTIE_PATH = "welcome.json"
-SAVED_CHAT_DIR = "archived/saved_chats"
+SAVED_CHAT_DIR = storage.SAVED_CHAT_DIR
+SEARCH_PAGE_SIZE = 10  # SEARCH_PAGE_SIZE: search results per sidebar page
+SIDEBAR_PAGE_SIZE = 10  # SIDEBAR_PAGE_SIZE: history / saved chats listed per sidebar page
+
+# (history db, saved folder) -> manifest mtime when its saved chats were last checked against the search index
+_search_synced = {}
+
+# history db -> (cached history listing, its CIDs as a tuple) for O(1) Next/Previous
+_cid_indexes = {}
 
  # Get the absolute path of the current file (main.py or this module)
 base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -24,6 +43,40 @@ os.makedirs(SAVED_CHAT_DIR, exist_ok=True)
 
 # -------------------- 🔑 UTILS --------------------
 
+def _history_db() -> str:
+    """History database shard of the logged-in user."""
+    return storage.user_history_db(st.session_state.get("logged_in_user"))
+
+
+def _saved_chat_dir() -> str:
+    """Saved chat folder of the logged-in user (created on demand)."""
+    saved_dir = storage.user_saved_chat_dir(st.session_state.get("logged_in_user"))
+    os.makedirs(saved_dir, exist_ok=True)
+    return saved_dir
+
+
+def ui_fragment(func):
+    """Render ``func`` as an ``st.fragment`` so its widgets rerun only that part of the page.
+
+    UI_FRAGMENTS=0 (checked on every call) falls back to plain full-app reruns.
+    """
+    fragment = st.fragment(func) if hasattr(st, "fragment") else func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if env_flag("UI_FRAGMENTS", True):
+            return fragment(*args, **kwargs)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def _rerun_scope() -> str:
+    """``"fragment"`` during a fragment rerun, else ``"app"`` (Streamlit rejects fragment scope in full runs)."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return "fragment" if ctx and ctx.fragment_ids_this_run else "app"
+
+
 def generate_cid() -> str:
     """Generate a unique chat ID based on timestamp and UUID"""
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -31,14 +84,6 @@ def generate_cid() -> str:
     return f"cid_{timestamp}_{random_part}"
 
 
-def compute_chat_hash(chat_history) -> str:
-    """Compute a SHA256 hash of the entire chat content for de-duplication"""
-    try:
-        content = "".join([msg.content for msg in chat_history])
-        return hashlib.sha256(content.encode("utf-8")).hexdigest()
-    except Exception:
-        return None
-
 def sanitize_text(text: str) -> str:
     """Remove extra whitespace, HTML tags, and sanitize text for display or filenames."""
     try:
@@ -53,7 +98,7 @@ def generate_chat_title(chat_history) -> str:
     """Generate a readable title from the first user message."""
     try:
         for msg in chat_history:
-            if isinstance(msg, HumanMessage):
+            if role_of(msg) == USER:
                 first_msg = msg.content.strip()
                 break
         else:
@@ -66,95 +111,79 @@ def generate_chat_title(chat_history) -> str:
     except Exception:
         return "Untitled Chat"
 
-def save_to_history(chat_history):
-    """Save the current chat to history.json, avoiding duplicates."""
+def save_to_history(chat_history, cid: str = None) -> bool:
+    """Append the unsaved tail of the current chat to its history record.
+
+    The chat is bound to a stable CID (``st.session_state.cid`` by default), so each
+    turn only writes the messages added since the last save instead of a new copy.
+    Returns True when this save created the chat's history record.
+    """
+    with metrics.span("save_to_history"):
+        return _save_to_history(chat_history, cid)
+
+def _save_to_history(chat_history, cid: str = None) -> bool:
     try:
         if not chat_history:
-            return
-
-        history_data = {}
-        if os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                history_data = json.load(f)
+            return False
+
+        cid = cid or st.session_state.get("cid")
+        if not cid:
+            cid = st.session_state.cid = generate_cid()
+
+        db_path = _history_db()
+        writer = get_history_writer()
+        saved = st.session_state.get("history_saved")
+        if saved and saved[0] == (db_path, cid) and writer and writer.take_failure(db_path, cid):
+            # A queued turn of this chat was not written: recount so it is sent again
+            st.warning("⚠️ An earlier message could not be saved to history; retrying.")
+            saved = None
+        if saved and saved[0] == (db_path, cid):
+            stored = saved[1]  # queued writes may not be on disk yet, so trust our own count
+        else:
+            flush_history_writes(db_path)
+            if writer:
+                writer.take_failure(db_path, cid)  # the count below already reflects it
+            stored = storage.message_count(cid, db_path)
+        new_messages = chat_history[stored:]
+        if not new_messages:
+            return False  # Nothing new since the last save
 
-        # Generate unique CID and hash
-        chat_hash = compute_chat_hash(chat_history)
-        for existing in history_data.values():
-            if existing.get("hash") == chat_hash:
-                return  # Chat already exists, skip save
+        formatted_chat = to_stored(new_messages)
 
-        cid = generate_cid()
-        title = generate_chat_title(chat_history)
+        title = generate_chat_title(chat_history) if stored == 0 else None
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        formatted_chat = []
-        for m in chat_history:
-            if isinstance(m, HumanMessage):
-                formatted_chat.append({"role": "user", "content": m.content})
-            elif isinstance(m, AIMessage):
-                formatted_chat.append({"role": "ai", "content": m.content})
-            elif isinstance(m, dict):
-                formatted_chat.append({
-                    "role": m.get("role", "unknown"),
-                    "content": m.get("content", "")
-                })
-            else:
-                continue  # Unknown format
-
-        history_data[cid] = {
-            "title": title,
-            "hash": chat_hash,
-            "timestamp": timestamp,
-            "chat": formatted_chat
-        }
-
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump(history_data, f, indent=2, ensure_ascii=False)
+        if writer:
+            # Written in the background; the reply is not held up by disk latency
+            writer.submit(db_path, cid, title, timestamp, formatted_chat)
+        else:
+            storage.append_messages(cid, title, timestamp, formatted_chat, db_path)
+            cache.invalidate(f"history:{db_path}")
+        st.session_state.history_saved = ((db_path, cid), len(chat_history))
+        return stored == 0
 
     except Exception as e:
         st.error(f"Failed to save history: {e}")
+        return False
 
 def load_chat_history():
-    """Load all chats from history.json, sorted by timestamp (latest first)."""
-    if not os.path.exists(HISTORY_FILE):
-        return {}
-
+    """Load the user's chat metadata from their history database, sorted by timestamp (latest first)."""
     try:
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        if not isinstance(data, dict):
-            st.error("Chat history file is corrupted or has invalid format.")
-            return {}
-
-        # Sort by timestamp descending
-        sorted_data = dict(
-            sorted(
-                data.items(),
-                key=lambda item: item[1].get("timestamp", ""),
-                reverse=True
-            )
-        )
-        return sorted_data
-
+        db_path = _history_db()
+        flush_history_writes(db_path)
+        return cache.cached_load(f"history:{db_path}", storage.db_files(db_path), lambda: storage.list_chats(db_path))
     except Exception as e:
         st.error(f"❌ Failed to load chat history: {e}")
         return {}
     
 def remove_from_history(cid: str):
-    """Remove a specific chat from history.json using its CID."""
-    if not os.path.exists(HISTORY_FILE):
-        st.warning("No chat history found.")
-        return
-
+    """Remove a specific chat from the history database using its CID."""
     try:
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            history_data = json.load(f)
-
-        if cid in history_data:
-            del history_data[cid]
-            with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-                json.dump(history_data, f, indent=2)
+        db_path = _history_db()
+        flush_history_writes(db_path)  # a queued turn must not re-create the chat after deletion
+        removed = storage.delete_chat(cid, db_path)
+        st.session_state.pop("history_saved", None)
+        cache.invalidate(f"history:{db_path}")
+        if removed:
             st.success(f"Removed chat history: {cid}")
         else:
             st.warning("Chat ID not found in history.")
@@ -163,10 +192,13 @@ def remove_from_history(cid: str):
         st.error(f"Failed to remove history: {e}")
 
 def clear_chat_history():
-    """Clear all chat history by resetting history.json."""
+    """Clear all chat history from the history database."""
     try:
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            json.dump({}, f, indent=2)
+        db_path = _history_db()
+        flush_history_writes(db_path)
+        storage.clear_chats(db_path)
+        st.session_state.pop("history_saved", None)
+        cache.invalidate(f"history:{db_path}")
         st.success("All chat history cleared successfully.")
     except Exception as e:
         st.error(f"Failed to clear history: {e}")
@@ -181,77 +213,81 @@ def save_chat(chat_history):
         cid = generate_cid()
         title = generate_chat_title(chat_history)
         filename = f"{cid}_{title}.json"
-        filepath = os.path.join(SAVED_CHAT_DIR, filename)
+        saved_dir = _saved_chat_dir()
+        filepath = os.path.join(saved_dir, filename)
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         chat_data = {
             "cid": cid,
             "title": title,
-            "timestamp": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "chat": [
-                {"role": "user" if isinstance(m, HumanMessage) else "ai", "content": m.content}
-                for m in chat_history
-            ]
+            "timestamp": timestamp,
+            "chat": to_stored(chat_history)
         }
 
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(chat_data, f, indent=2)
+        storage.atomic_write_json(filepath, chat_data, indent=2)
+        storage.add_to_manifest(saved_dir, cid, title, timestamp, filename)
+        storage.index_saved_chat(cid, title, chat_data["chat"], _history_db())
+        cache.invalidate(f"saved_chats:{saved_dir}")
 
         st.success(f"Chat saved as: {filename}")
     except Exception as e:
         st.error(f"Failed to save chat: {e}")
 
-def load_saved_chats():
-    """Load all saved chats from saved_chats/ folder with metadata."""
-    saved_chats = {}
-
-    if not os.path.exists(SAVED_CHAT_DIR):
-        return {}
+def _read_saved_chats(saved_dir: str) -> dict:
+    """Read saved chat metadata from the manifest (uncached); transcripts stay on disk."""
+    saved_chats = {
+        cid: {
+            "title": entry.get("title", "Untitled"),
+            "timestamp": entry.get("timestamp", ""),
+            "file": os.path.join(saved_dir, entry.get("file", ""))
+        }
+        for cid, entry in storage.read_manifest(saved_dir).items()
+    }
+
+    # Sort by latest timestamp
+    return dict(
+        sorted(
+            saved_chats.items(),
+            key=lambda item: item[1].get("timestamp", ""),
+            reverse=True
+        )
+    )
 
+def load_saved_chats():
+    """Load saved chat metadata (title, timestamp, file) from the manifest, cached until it changes."""
     try:
-        for filename in os.listdir(SAVED_CHAT_DIR):
-            if filename.endswith(".json"):
-                filepath = os.path.join(SAVED_CHAT_DIR, filename)
-                with open(filepath, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-
-                cid = data.get("cid") or filename.replace(".json", "")
-                title = data.get("title", "Untitled")
-                timestamp = data.get("timestamp", "")
-
-                saved_chats[cid] = {
-                    "title": title,
-                    "timestamp": timestamp,
-                    "file": filepath,
-                    "chat": data.get("chat", [])
-                }
-
-        # Sort by latest timestamp
-        sorted_chats = dict(
-            sorted(
-                saved_chats.items(),
-                key=lambda item: item[1].get("timestamp", ""),
-                reverse=True
-            )
+        saved_dir = _saved_chat_dir()
+        return cache.cached_load(
+            f"saved_chats:{saved_dir}", [storage.manifest_path(saved_dir)], lambda: _read_saved_chats(saved_dir)
         )
-        return sorted_chats
-
     except Exception as e:
         st.error(f"Failed to load saved chats: {e}")
         return {}
 
+def load_saved_chat_body(cid: str) -> dict:
+    """Read one saved chat file in full; only called when the user opens or downloads it."""
+    chat_data = load_saved_chats().get(cid)
+    if not chat_data:
+        return None
+
+    with open(chat_data["file"], "r", encoding="utf-8") as f:
+        return json.load(f)
+
 def clear_saved_chats():
-    """Delete all saved chat files from the saved_chats/ directory."""
-    if not os.path.exists(SAVED_CHAT_DIR):
-        st.warning("Saved chat directory does not exist.")
-        return
+    """Delete all of the user's saved chat files."""
+    saved_dir = _saved_chat_dir()
 
     try:
         count = 0
-        for filename in os.listdir(SAVED_CHAT_DIR):
-            filepath = os.path.join(SAVED_CHAT_DIR, filename)
-            if os.path.isfile(filepath) and filename.endswith(".json"):
-                os.remove(filepath)
-                count += 1
+        with storage.locked(storage.manifest_path(saved_dir)):
+            for filename in os.listdir(saved_dir):
+                filepath = os.path.join(saved_dir, filename)
+                if os.path.isfile(filepath) and filename.endswith(".json"):
+                    os.remove(filepath)
+                    count += 1
+            storage.write_manifest(saved_dir, {})
+        storage.unindex_saved_chat(None, _history_db())
+        cache.invalidate(f"saved_chats:{saved_dir}")
         st.success(f"Cleared {count} saved chat(s).")
     except Exception as e:
         st.error(f"Failed to clear saved chats: {e}")
@@ -289,13 +325,18 @@ def remove_saved_chat(cid: str):
         return
 
     try:
-        os.remove(chat_data["file"])
+        saved_dir = _saved_chat_dir()
+        with storage.locked(storage.manifest_path(saved_dir)):
+            os.remove(chat_data["file"])
+            storage.remove_from_manifest(saved_dir, cid)
+        storage.unindex_saved_chat(cid, _history_db())
+        cache.invalidate(f"saved_chats:{saved_dir}")
         st.success(f"Removed saved chat: {chat_data['title']}")
     except Exception as e:
         st.error(f"Failed to remove saved chat: {e}")
 
 def open_saved_chat(cid: str) -> list:
-    """Load a saved chat from file and return as LangChain message objects."""
+    """Load a saved chat from file and return it as chat records."""
     saved_chats = load_saved_chats()
     chat_data = saved_chats.get(cid)
 
@@ -304,15 +345,9 @@ def open_saved_chat(cid: str) -> list:
         return []
 
     try:
-        with open(chat_data["file"], "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = load_saved_chat_body(cid) or {}
 
-        chat_history = []
-        for msg in data.get("chat", []):
-            if msg["role"] == "user":
-                chat_history.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "ai":
-                chat_history.append(AIMessage(content=msg["content"]))
+        chat_history = from_stored(data.get("chat", []))
 
         st.success(f"Loaded saved chat: {chat_data['title']}")
         return chat_history
@@ -336,7 +371,6 @@ def handle_new_chat():
     st.session_state.from_saved_chat = False
     st.session_state.from_history = False
     st.session_state.chat_loaded = False
-    st.session_state.chat_hash = None
     st.session_state.cid = generate_cid()  # prepare new chat CID
 
     # Clear sidebar states (if you add chat selection)
@@ -347,27 +381,16 @@ def handle_new_chat():
     st.rerun()
 
 def open_chat_from_history(cid: str) -> list:
-    """Load a specific chat by CID from the shared history.json file."""
-    if not os.path.exists(HISTORY_FILE):
-        st.warning("Chat history file not found.")
-        return []
-
+    """Load a specific chat by CID from the history database."""
     try:
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            history_data = json.load(f)
-
-        if cid not in history_data:
+        db_path = _history_db()
+        flush_history_writes(db_path)
+        chat_entry = storage.get_chat(cid, db_path)
+        if chat_entry is None:
             st.warning("Chat not found in history.")
             return []
 
-        chat_entry = history_data[cid]
-        chat_history = []
-
-        for msg in chat_entry.get("chat", []):
-            if msg["role"] == "user":
-                chat_history.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "ai":
-                chat_history.append(AIMessage(content=msg["content"]))
+        chat_history = from_stored(chat_entry.get("chat", []))
 
         st.success(f"Loaded chat from history: {chat_entry.get('title', 'Untitled')}")
         return chat_history
@@ -376,62 +399,64 @@ def open_chat_from_history(cid: str) -> list:
         st.error(f"Failed to open chat from history: {e}")
         return []
 
-def handle_next_chat():
-    """Navigate to the next chat (history or saved), update session and rerun."""
-    all_chats = list(load_chat_history().keys())  # or load_saved_chats() if using saved
-    if not all_chats:
-        st.warning("No chats available.")
-        return
-
-    # Initialize index if not set
-    if st.session_state.get("chat_index") is None:
-        st.session_state.chat_index = 0
-    else:
-        st.session_state.chat_index = (st.session_state.chat_index + 1) % len(all_chats)
-
-    # Get next chat CID
-    cid = all_chats[st.session_state.chat_index]
-    loaded_chat = open_chat_from_history(cid)  # or open_saved_chat(cid)
+def history_cid_index() -> tuple:
+    """CIDs of the user's history, latest first, rebuilt only when the cached history listing changes."""
+    db_path = _history_db()
+    history = load_chat_history()
+    cached = _cid_indexes.get(db_path)
+    if cached is None or cached[0] is not history:
+        cached = _cid_indexes[db_path] = (history, tuple(history))
+    return cached[1]
+
+def _open_history_at(index: int, all_cids: tuple):
+    """Open the history chat at a position of the CID index, fetching only that record."""
+    st.session_state.chat_index = index
+    cid = all_cids[index]
+    loaded_chat = open_chat_from_history(cid)
+    title = load_chat_history().get(cid, {}).get("title")
 
     # Update session state
     st.session_state.chat_history = loaded_chat
     st.session_state.opened_chat_cid = cid
-    st.session_state.current_chat_title = generate_chat_title(loaded_chat)
+    st.session_state.cid = cid  # new turns extend this history record
+    st.session_state.current_chat_title = title or generate_chat_title(loaded_chat)
     st.session_state.chat_loaded = True
     st.session_state.chat_input = ""
     st.rerun()
 
+def handle_next_chat():
+    """Navigate to the next chat in history, update session and rerun."""
+    all_cids = history_cid_index()
+    if not all_cids:
+        st.warning("No chats available.")
+        return
+
+    # Initialize index if not set
+    if st.session_state.get("chat_index") is None:
+        index = 0
+    else:
+        index = (st.session_state.chat_index + 1) % len(all_cids)
+    _open_history_at(index, all_cids)
+
 def handle_previous_chat():
     """Navigate to the previous chat from history."""
-    history_data = load_chat_history()
-    all_cids = list(history_data.keys())
-
+    all_cids = history_cid_index()
     if not all_cids:
         st.warning("No chats in history.")
         return
 
     # Initialize or update index
     if st.session_state.get("chat_index") is None:
-        st.session_state.chat_index = len(all_cids) - 1
+        index = len(all_cids) - 1
     else:
-        st.session_state.chat_index = (st.session_state.chat_index - 1) % len(all_cids)
-
-    cid = all_cids[st.session_state.chat_index]
-    loaded_chat = open_chat_from_history(cid)
-
-    # Update session state
-    st.session_state.chat_history = loaded_chat
-    st.session_state.opened_chat_cid = cid
-    st.session_state.current_chat_title = generate_chat_title(loaded_chat)
-    st.session_state.chat_loaded = True
-    st.session_state.chat_input = ""
-    st.rerun()
+        index = (st.session_state.chat_index - 1) % len(all_cids)
+    _open_history_at(index, all_cids)
 
 def refresh_app():
     """Reset key session states and refresh the app UI."""
     keys_to_reset = [
         "chat_index", "chat_history", "chat_input", "opened_chat_cid",
-        "current_chat_title", "chat_loaded"
+        "current_chat_title", "chat_loaded", "cid"
     ]
     for key in keys_to_reset:
         st.session_state.pop(key, None)
@@ -439,37 +464,150 @@ def refresh_app():
     st.rerun()
 
 def clean_saved_chat_directory():
-    """Remove all chat files from the saved chats directory."""
+    """Remove all chat files from the user's saved chats directory."""
+    saved_dir = _saved_chat_dir()
     removed_count = 0
-    for filename in os.listdir(SAVED_CHAT_DIR):
-        if filename.endswith(".json"):
-            try:
-                file_path = os.path.join(SAVED_CHAT_DIR, filename)
-                os.remove(file_path)
-                removed_count += 1
-            except Exception as e:
-                st.warning(f"Error deleting {filename}: {e}")
+    with storage.locked(storage.manifest_path(saved_dir)):
+        for filename in os.listdir(saved_dir):
+            if filename.endswith(".json"):
+                try:
+                    file_path = os.path.join(saved_dir, filename)
+                    os.remove(file_path)
+                    removed_count += 1
+                except Exception as e:
+                    st.warning(f"Error deleting {filename}: {e}")
+        storage.rebuild_manifest(saved_dir)
+        storage.unindex_saved_chat(None, _history_db())
+    cache.invalidate(f"saved_chats:{saved_dir}")
 
     if removed_count > 0:
         st.success(f"Cleaned {removed_count} saved chats.")
     else:
         st.info("No saved chat files to remove.")
 
+def _sync_saved_search_index(db_path: str, saved_dir: str):
+    """Index saved chats written before search existed (or by another process) and drop stale entries.
+
+    Runs again whenever the manifest's mtime changes, so another process's saves are picked up.
+    """
+    try:
+        mtime = os.stat(storage.manifest_path(saved_dir)).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime is not None and _search_synced.get((db_path, saved_dir)) == mtime:
+        return
+    with storage.locked(storage.manifest_path(saved_dir)):
+        manifest = storage.read_manifest(saved_dir)
+        indexed = storage.indexed_saved_chats(db_path)
+        for cid in indexed - set(manifest):
+            storage.unindex_saved_chat(cid, db_path)
+        for cid in set(manifest) - indexed:
+            try:
+                with open(os.path.join(saved_dir, manifest[cid].get("file", "")), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            storage.index_saved_chat(cid, data.get("title", "Untitled"), data.get("chat", []), db_path)
+    _search_synced[(db_path, saved_dir)] = mtime
+
+def search_chats(query: str, page: int = 0):
+    """Ranked full-text search over the user's history and saved chats. Returns (results, has_more)."""
+    try:
+        db_path = _history_db()
+        flush_history_writes(db_path)  # queued turns become searchable as soon as they are on disk
+        _sync_saved_search_index(db_path, _saved_chat_dir())
+        page_size = env_int("SEARCH_PAGE_SIZE", SEARCH_PAGE_SIZE)
+        return storage.search_chats(query, db_path, limit=page_size, offset=page * page_size)
+    except Exception as e:
+        st.error(f"Search failed: {e}")
+        return [], False
+
+@ui_fragment
+def display_search_sidebar():
+    """Search box with paginated results; opening a result works like opening it from its list."""
+    query = st.text_input("🔎 Search chats", key="search_query", placeholder="Search titles and messages")
+    if not query.strip():
+        return
+
+    if st.session_state.get("search_for") != query:
+        st.session_state.search_for = query
+        st.session_state.search_page = 0
+    page = st.session_state.get("search_page", 0)
+
+    results, has_more = search_chats(query, page)
+    if not results:
+        st.info("No matching chats.")
+        return
+
+    for result in results:
+        cid, source = result["cid"], result["source"]
+        icon = "🗂️" if source == "history" else "💬"
+        if st.button(f"{icon} {result['title']}", key=f"search_{source}_{cid}", use_container_width=True):
+            if source == "history":
+                st.session_state.chat_history = open_chat_from_history(cid)
+                st.session_state.cid = cid
+            else:
+                st.session_state.chat_history = open_saved_chat(cid)
+                st.session_state.cid = generate_cid()
+            st.session_state.opened_chat_cid = cid
+            st.session_state.current_chat_title = result["title"]
+            st.session_state.chat_loaded = True
+            st.rerun()
+        if result["snippet"]:
+            st.caption(result["snippet"])
+
+    col1, col2 = st.columns(2)
+    if page > 0 and col1.button("⬅️ Prev", key="search_prev", use_container_width=True):
+        st.session_state.search_page = page - 1
+        st.rerun(scope=_rerun_scope())
+    if has_more and col2.button("Next ➡️", key="search_next", use_container_width=True):
+        st.session_state.search_page = page + 1
+        st.rerun(scope=_rerun_scope())
+
+def _sidebar_page(items: dict, state_key: str):
+    """Return ``(page items, page, pages)`` for a latest-first chat listing.
+
+    Only one page of widgets is built per rerun, however many chats there are.
+    """
+    page_size = max(1, env_int("SIDEBAR_PAGE_SIZE", SIDEBAR_PAGE_SIZE))
+    pages = max(1, -(-len(items) // page_size))
+    page = min(st.session_state.get(state_key, 0), pages - 1)
+    st.session_state[state_key] = page
+    start = page * page_size
+    return list(itertools.islice(items.items(), start, start + page_size)), page, pages
+
+def _render_pager(state_key: str, page: int, pages: int):
+    """Prev/Next buttons for a paginated sidebar list."""
+    if pages <= 1:
+        return
+    col1, col2, col3 = st.columns([1, 2, 1])
+    if col1.button("⬅️", key=f"{state_key}_prev", disabled=page == 0):
+        st.session_state[state_key] = page - 1
+        st.rerun(scope=_rerun_scope())
+    col2.caption(f"Page {page + 1} of {pages}")
+    if col3.button("➡️", key=f"{state_key}_next", disabled=page >= pages - 1):
+        st.session_state[state_key] = page + 1
+        st.rerun(scope=_rerun_scope())
+
+@ui_fragment
 def display_chat_history_sidebar():
     """Display all chat history entries in the sidebar with open and delete options."""
-    st.sidebar.subheader("🕓 Chat History")
+    st.subheader("🕓 Chat History")
     history_data = load_chat_history()
 
     if not history_data:
-        st.sidebar.info("No chat history found.")
+        st.info("No chat history found.")
         return
 
-    for cid, chat in sorted(history_data.items(), key=lambda x: x[1].get("timestamp", ""), reverse=True):
+    # history_data is already latest-first
+    page_items, page, pages = _sidebar_page(history_data, "history_page")
+    for cid, chat in page_items:
         title = chat.get("title", "Untitled")
-        with st.sidebar.expander(f"🗂️ {title}", expanded=False):
+        with st.expander(f"🗂️ {title}", expanded=False):
             if st.button(f"📂 Open", key=f"open_{cid}"):
                 st.session_state.chat_history = open_chat_from_history(cid)
                 st.session_state.opened_chat_cid = cid
+                st.session_state.cid = cid  # new turns extend this history record
                 st.session_state.current_chat_title = chat.get("title", "Untitled")
                 st.session_state.chat_loaded = True
                 st.rerun()
@@ -478,46 +616,61 @@ def display_chat_history_sidebar():
                 remove_from_history(cid)
                 st.rerun()
 
+    _render_pager("history_page", page, pages)
+
+@ui_fragment
 def display_saved_chats_sidebar():
     """Display all saved chats in the sidebar with open, download, and delete options."""
-    st.sidebar.subheader("💾 Saved Chats")
+    st.subheader("💾 Saved Chats")
     saved_chats = load_saved_chats()
 
     if not saved_chats:
-        st.sidebar.info("No saved chats found.")
+        st.info("No saved chats found.")
         return
 
-    for cid, chat in sorted(saved_chats.items(), key=lambda x: x[1].get("timestamp", ""), reverse=True):
+    # saved_chats is already latest-first
+    page_items, page, pages = _sidebar_page(saved_chats, "saved_page")
+    for cid, chat in page_items:
         title = chat.get("title", "Untitled")
-        with st.sidebar.expander(f"💬 {title}", expanded=False):
+        with st.expander(f"💬 {title}", expanded=False):
             if st.button(f"📂 Open", key=f"open_saved_{cid}"):
                 st.session_state.chat_history = open_saved_chat(cid)
                 st.session_state.opened_chat_cid = cid
+                st.session_state.cid = generate_cid()  # continuing a saved chat starts a new history record
                 st.session_state.current_chat_title = chat.get("title", "Untitled")
                 st.session_state.chat_loaded = True
                 st.rerun()
 
-            if st.download_button("⬇️ Download", data=json.dumps(chat, indent=2), file_name=f"{cid}.json", mime="application/json", key=f"download_{cid}"):
-                st.toast("Downloaded chat successfully!")
+            # The transcript is only read for the chat the user asked to download
+            if st.session_state.get("download_cid") == cid:
+                download_saved_chat(cid)
+            elif st.button("⬇️ Download", key=f"download_{cid}"):
+                st.session_state.download_cid = cid
+                st.rerun(scope=_rerun_scope())
 
             if st.button(f"🗑️ Delete", key=f"delete_saved_{cid}"):
                 remove_saved_chat(cid)
                 st.rerun()
 
+    _render_pager("saved_page", page, pages)
+
+@ui_fragment
 def render_sidebar_buttons():
     """Render all sidebar action buttons for chat navigation and control."""
-    st.sidebar.markdown("### ⚙️ Chat Controls")
+    st.markdown("### ⚙️ Chat Controls")
 
     # New Chat
-    if st.sidebar.button("🆕 New Chat", use_container_width=True):
+    if st.button("🆕 New Chat", use_container_width=True):
         handle_new_chat()
 
     # Save Chat
-    if st.sidebar.button("💾 Save Chat", use_container_width=True):
+    if st.button("💾 Save Chat", use_container_width=True):
         try:
             if st.session_state.get("chat_history"):
                 save_chat(st.session_state.chat_history)
-                st.toast("✅ Chat saved successfully!")
+                # Full rerun so the saved chat list (another fragment) shows it; render_bot shows the toast
+                st.session_state.flash_toast = "✅ Chat saved successfully!"
+                st.rerun()
             else:
                 st.warning("No chat history to save.")
         except Exception as e:
@@ -525,17 +678,17 @@ def render_sidebar_buttons():
             st.exception(e)
 
     # Next Chat
-    if st.sidebar.button("➡️ Next Chat", use_container_width=True):
+    if st.button("➡️ Next Chat", use_container_width=True):
         handle_next_chat()
 
     # Previous Chat
-    if st.sidebar.button("⬅️ Previous Chat", use_container_width=True):
+    if st.button("⬅️ Previous Chat", use_container_width=True):
         handle_previous_chat()
 
-    st.sidebar.markdown("---")
+    st.markdown("---")
 
     # Clear Chat History
-    if st.sidebar.button("🧹 Clear Chat History", use_container_width=True):
+    if st.button("🧹 Clear Chat History", use_container_width=True):
         try:
             clear_chat_history()
             st.toast("🗑️ Chat history cleared.")
@@ -545,7 +698,7 @@ def render_sidebar_buttons():
             st.exception(e)
 
     # Clear Saved Chats
-    if st.sidebar.button("🧽 Clear Saved Chats", use_container_width=True):
+    if st.button("🧽 Clear Saved Chats", use_container_width=True):
         try:
             clear_saved_chats()
             st.toast("🗑️ Saved chats cleared.")
@@ -555,7 +708,7 @@ def render_sidebar_buttons():
             st.exception(e)
 
     # Clean Directory
-    if st.sidebar.button("🚫 Clean Saved Chat Folder", use_container_width=True):
+    if st.button("🚫 Clean Saved Chat Folder", use_container_width=True):
         try:
             clean_saved_chat_directory()
             st.toast("🧹 Cleaned empty saved chat files.")
@@ -564,13 +717,51 @@ def render_sidebar_buttons():
             st.error("Failed to clean saved chat directory.")
             st.exception(e)
 
-    st.sidebar.markdown("---")
+    st.markdown("---")
 
     # Refresh App
-    if st.sidebar.button("🔄 Refresh", use_container_width=True):
+    if st.button("🔄 Refresh", use_container_width=True):
         refresh_app()
 
+def minify_lottie(data, precision: int = 3):
+    """Round float keyframe values and drop editor-only metadata from a Lottie document."""
+    def _round(value):
+        if isinstance(value, float):
+            value = round(value, precision)
+            return int(value) if value.is_integer() else value
+        if isinstance(value, list):
+            return [_round(v) for v in value]
+        if isinstance(value, dict):
+            return {k: _round(v) for k, v in value.items()}
+        return value
+
+    data = _round(data)
+    data.pop("meta", None)
+    return data
+
+@st.cache_resource(show_spinner=False)
+def _read_lottie(asset_path: str, mtime_ns: int, minify: bool):
+    """Parse a Lottie file once per process; mtime_ns is part of the cache key so edits are picked up."""
+    if not minify:
+        with open(asset_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    # Precompute a minified copy next to the source so later process starts read the smaller file
+    min_path = asset_path[:-len(".json")] + ".min.json"
+    if os.path.exists(min_path) and os.stat(min_path).st_mtime_ns >= mtime_ns:
+        with open(min_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    with open(asset_path, "r", encoding="utf-8") as file:
+        data = minify_lottie(json.load(file))
+    try:
+        storage.atomic_write_json(min_path, data, separators=(",", ":"))
+    except OSError:
+        pass  # read-only install: serve the minified copy from memory and recompute next start
+    return data
+
 def load_lottie_animation(filename: str):
+    """Return the parsed Lottie animation, served from the process-wide resource cache."""
     try:
         # go up one level if current file is inside assets/
         base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -581,14 +772,43 @@ def load_lottie_animation(filename: str):
             st.warning(f"⚠️ Lottie file not found: {asset_path}")
             return None
 
-        with open(asset_path, "r", encoding="utf-8") as file:
-            return json.load(file)
+        return _read_lottie(asset_path, os.stat(asset_path).st_mtime_ns, env_flag("LOTTIE_MINIFY", False))
 
     except Exception as e:
         st.warning(f"Error loading Lottie animation: {e}")
         return None
 
-        
+def record_llm_call(context: list, response_text: str, seconds: float):
+    """Record model latency and estimated prompt/completion tokens."""
+    metrics.observe("nexa_llm_seconds", seconds)
+    metrics.observe("nexa_llm_tokens", sum(message_tokens(m) for m in context), metrics.TOKEN_BUCKETS, direction="prompt")
+    metrics.observe("nexa_llm_tokens", count_tokens(response_text or ""), metrics.TOKEN_BUCKETS, direction="completion")
+
+def render_streamed_response(chat_model, messages) -> str:
+    """Stream the model reply into the current chat bubble and return the final visible text."""
+    placeholder = st.empty()
+    placeholder.markdown("**🤖 Nexa:** _thinking..._")
+
+    parts = []
+    started = time.perf_counter()
+    try:
+        for token in stream_visible_text(chat_model, messages):
+            if not parts:
+                metrics.observe("nexa_llm_first_token_seconds", time.perf_counter() - started)
+            parts.append(token)
+            placeholder.markdown(f"**🤖 Nexa:** {''.join(parts)}▌")
+    except Exception:
+        # Rejected or failed mid-stream: drop "thinking..." / the partial text; the caller shows why
+        placeholder.empty()
+        raise
+
+    response_text = "".join(parts).strip()
+    placeholder.markdown(f"**🤖 Nexa:** {response_text}")
+    return response_text
+
+@ui_fragment
+@metrics.timed("chat_pane")
+@profiled("render_main_chat_ui")
 def render_main_chat_ui(chat_model=None):
     """Main UI layout with Nexa branding, chat logic, and modern styling."""
     try:
@@ -602,35 +822,22 @@ def render_main_chat_ui(chat_model=None):
             </div>
         """, unsafe_allow_html=True)
 
-        # Load Lottie animation
-        animation = load_lottie_animation(LOTTIE_PATH)
-        if animation:
-            st_lottie(animation, speed=1, loop=True, height=180, key="welcome")
-        else:
-            st.info("⚠️ Welcome animation not available.")
+        # Load Lottie animation (by default only while the chat is empty, so busy reruns skip it)
+        if not st.session_state.get("chat_history") or not env_flag("LOTTIE_EMPTY_CHAT_ONLY", True):
+            animation = load_lottie_animation(LOTTIE_PATH)
+            if animation:
+                from streamlit_lottie import st_lottie  # only needed while the welcome screen shows
+                st_lottie(animation, speed=1, loop=True, height=180, key="welcome")
+            else:
+                st.info("⚠️ Welcome animation not available.")
 
         st.markdown("<hr style='border-top: 1px solid #ccc;'>", unsafe_allow_html=True)
         st.markdown("### 💬 Start Chatting")
 
-        # Display chat history
-        chat_history = st.session_state.get("chat_history", [])
-        for msg in chat_history:
-            if isinstance(msg, dict):
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-            elif isinstance(msg, HumanMessage):
-                role, content = "user", msg.content
-            elif isinstance(msg, AIMessage):
-                role, content = "assistant", msg.content
-            else:
-                continue  # Unknown format
-
-            # Clean tags
-            content = content.replace("<think>", "").replace("</think>", "").strip()
-
-            with st.chat_message("user" if role == "user" else "ai"):
-                name = "🧑 You" if role == "user" else "🤖 Nexa"
-                st.markdown(f"**{name}:** {content}")
+        # Display chat history (each record was cleaned once, when it was created)
+        for record in st.session_state.get("chat_history", []):
+            with st.chat_message(record.role):
+                st.markdown(f"**{'🧑 You' if record.role == USER else '🤖 Nexa'}:** {record.shown}")
 
         # Input prompt
         prompt = st.chat_input("Ask something...")
@@ -639,53 +846,90 @@ def render_main_chat_ui(chat_model=None):
             clean_prompt = prompt.strip()
 
             # Append user message
-            st.session_state.chat_history.append(HumanMessage(content=clean_prompt))
+            st.session_state.chat_history.append(ChatRecord("user", clean_prompt))
 
             with st.chat_message("user"):
                 st.markdown(f"**🧑 You:** {clean_prompt}")
 
             # Nexa AI response
             with st.chat_message("ai"):
-                with st.spinner("🤖 Nexa is thinking..."):
-                    try:
-                        response_text = None
-                        for key in CUSTOM_RESPONSES:
-                            if key.lower() in clean_prompt.lower():
-                                response_text = CUSTOM_RESPONSES[key].replace("<think>", "").replace("</think>", "").strip()
-                                break
-
+                try:
+                    with metrics.span("custom_response_lookup"):
+                        response_text = find_custom_response(clean_prompt)
+                    answer_source = "custom"
+                    if response_text:
+                        response_text = strip_think(response_text)
+
+                    # Opt-in cache of earlier model answers (RESPONSE_CACHE=1)
+                    response_cache = get_response_cache() if chat_model else None
+
+                    # Calls through the shared dispatcher count against this user's fair share
+                    model = chat_model
+                    if hasattr(chat_model, "for_user"):
+                        model = chat_model.for_user(st.session_state.get("logged_in_user"))
+                    if not response_text and response_cache is not None:
+                        cached = response_cache.get(st.session_state.chat_history)
+                        metrics.inc("nexa_response_cache_total", result=f"hit_{cached[1]}" if cached else "miss")
+                        if cached:
+                            response_text, tier = cached
+                            answer_source = f"cache_{tier}"
+
+                    if not response_text and chat_model and env_flag("STREAM_RESPONSES", True):
+                        # Tokens are rendered as they arrive; the bubble is already filled in
+                        answer_source = "llm"
+                        context = build_context(st.session_state.chat_history)
+                        started = time.perf_counter()
+                        response_text = render_streamed_response(model, to_langchain(context))
+                        record_llm_call(context, response_text, time.perf_counter() - started)
+                    else:
                         if not response_text and chat_model:
-                            ai_message = chat_model.invoke(st.session_state.chat_history)
-                            response_text = ai_message.content.replace("<think>", "").replace("</think>", "").strip()
-                            st.session_state.chat_history.append(AIMessage(content=response_text))
+                            answer_source = "llm"
+                            context = build_context(st.session_state.chat_history)
+                            started = time.perf_counter()
+                            with st.spinner("🤖 Nexa is thinking..."):
+                                ai_message = model.invoke(to_langchain(context))
+                            response_text = strip_think(ai_message.content)
+                            record_llm_call(context, ai_message.content, time.perf_counter() - started)
                         elif not response_text:
+                            answer_source = None
                             response_text = "🤖 Nexa response placeholder (no model linked)."
-                            st.session_state.chat_history.append(AIMessage(content=response_text))
-                        else:
-                            st.session_state.chat_history.append(AIMessage(content=response_text))
-
                         st.markdown(f"**🤖 Nexa:** {response_text}")
 
-                        # Save cleaned version
-                        save_to_history([
-                            {
-                                "role": "user" if isinstance(m, HumanMessage) else "assistant",
-                                "content": m.content.replace("<think>", "").replace("</think>", "").strip()
-                            }
-                            for m in st.session_state.chat_history
-                        ])
-
-                    except Exception as e:
-                        error_msg = f"⚠️ Error while generating response: {e}"
-                        st.markdown(f"**🤖 Nexa:** {error_msg}")
-                        st.session_state.chat_history.append(AIMessage(content=error_msg))
-                        st.toast("❌ Failed to get response", icon="⚠️")
-                        st.exception(e)
+                    if answer_source:
+                        record_answer_source(answer_source)
+                        metrics.inc("nexa_answers_total", source=answer_source)
+                    if answer_source == "llm" and response_cache is not None:
+                        response_cache.put(st.session_state.chat_history, response_text)
+
+                    st.session_state.chat_history.append(ChatRecord("ai", response_text))
+
+                    # Persist only this turn; earlier messages are already stored under the chat CID
+                    created = save_to_history(st.session_state.chat_history, st.session_state.cid)
+
+                    # The first save of a chat (a new one, or one reopened under a new CID) gives it
+                    # a history entry; the sidebar list is a separate fragment, so rerun the whole page
+                    if created and _rerun_scope() == "fragment":
+                        st.rerun()
+
+                except DispatcherBusy as e:
+                    metrics.inc("nexa_errors_total", stage="llm_busy")
+                    st.markdown(f"**🤖 Nexa:** ⏳ {e}")
+                    st.session_state.chat_history.pop()  # the question was not answered, let the user resend it
+                    st.toast("Nexa is busy, please retry", icon="⏳")
+
+                except Exception as e:
+                    metrics.inc("nexa_errors_total", stage="chat_turn")
+                    error_msg = f"⚠️ Error while generating response: {e}"
+                    st.markdown(f"**🤖 Nexa:** {error_msg}")
+                    st.session_state.chat_history.append(ChatRecord("ai", error_msg))
+                    st.toast("❌ Failed to get response", icon="⚠️")
+                    st.exception(e)
 
     except Exception as e:
         st.error("🚨 Unexpected error occurred while rendering the main UI.")
         st.exception(e)
 
+@profiled("render_bot")
 def render_bot(chat_model):
     """Main entry point to render Nexa AI chatbot with full UI, history, and controls."""
     try:
@@ -696,6 +940,9 @@ def render_bot(chat_model):
         if "chat_history" not in st.session_state:
             st.session_state.chat_history = []
 
+        if "cid" not in st.session_state:
+            st.session_state.cid = generate_cid()
+
         if "active_chat_index" not in st.session_state:
             st.session_state.active_chat_index = None
 
@@ -703,22 +950,20 @@ def render_bot(chat_model):
             st.session_state.page_loaded = True
             st.toast("👋 Welcome to Nexa AI!", icon="🤖")
 
-        if "saved_chats" not in st.session_state:
-            st.session_state.saved_chats = []
-
-        if "history_cache" not in st.session_state:
-            st.session_state.history_cache = []
+        # Notices queued just before a full rerun (a toast shown by a fragment would be lost)
+        if "flash_toast" in st.session_state:
+            st.toast(st.session_state.pop("flash_toast"))
 
-        # Load all history and saved chats on first load
-        if st.session_state.page_loaded:
-            st.session_state.history_cache = load_chat_history()
-            st.session_state.saved_chats = load_saved_chats()
+        # History and saved chat listings are not copied into the session: the sidebar reads
+        # them from the shared process-level caches (load_chat_history / load_saved_chats)
 
-        # 🔧 UI Components
-        render_sidebar_buttons()
-        display_chat_history_sidebar()
-        display_saved_chats_sidebar()
-        render_main_chat_ui(chat_model)
+        # 🔧 UI Components: each is a fragment, so a click inside one reruns only that part
+        with metrics.span("bot_sidebar"), st.sidebar:
+            render_sidebar_buttons()
+            display_search_sidebar()
+            display_chat_history_sidebar()
+            display_saved_chats_sidebar()
+        render_main_chat_ui(chat_model)  # timed as "chat_pane", also on its own fragment reruns
 
     except Exception as e:
         st.error("🚨 Critical error occurred while rendering Nexa AI.")
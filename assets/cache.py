@@ -0,0 +1,65 @@
+from . import metrics
+import threading
+import time
+import os
+
+# How often (seconds) a cached entry re-stats its files to notice writes from other processes.
+# Writes made through this process invalidate the entry immediately.
+STAT_INTERVAL = 1.0
+
+# Process-wide: shared by every Streamlit session running in this server
+_lock = threading.Lock()
+_entries = {}  # key -> {"signature": tuple, "checked": float, "value": object}
+_generation = 0  # bumped on every invalidation so a load racing a write is not cached
+
+
+def file_signature(paths) -> tuple:
+    """Return a (path, mtime_ns, size) tuple for each path; missing files are recorded as None."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def cached_load(key: str, paths, loader):
+    """Return the cached result of ``loader()`` for ``key``, reloading when ``paths`` change on disk.
+
+    The value is shared across sessions and must be treated as read-only by callers.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and now - entry["checked"] < STAT_INTERVAL:
+            metrics.inc("nexa_loader_cache_total", result="hit")
+            return entry["value"]
+
+    signature = file_signature(paths)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None and entry["signature"] == signature:
+            entry["checked"] = now
+            metrics.inc("nexa_loader_cache_total", result="hit")
+            return entry["value"]
+        generation = _generation
+
+    metrics.inc("nexa_loader_cache_total", result="miss")
+    value = loader()
+    with _lock:
+        if generation == _generation:
+            _entries[key] = {"signature": signature, "checked": now, "value": value}
+    return value
+
+
+def invalidate(key: str = None):
+    """Drop one cached entry (write-through after a save/delete), or all of them."""
+    global _generation
+    with _lock:
+        _generation += 1
+        if key is None:
+            _entries.clear()
+        else:
+            _entries.pop(key, None)
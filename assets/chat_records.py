@@ -0,0 +1,73 @@
+from langchain_core.messages import AIMessage, HumanMessage
+import sys
+
+USER = sys.intern("user")
+AI = sys.intern("ai")
+
+
+class ChatRecord:
+    """One message of the open chat, kept in session state instead of a LangChain object.
+
+    ``shown`` is the cleaned display text, worked out once when the record is created.
+    It is the ``content`` string itself unless there were tags to strip, so a record
+    costs little more than its text.
+    """
+
+    __slots__ = ("role", "content", "shown")
+
+    def __init__(self, role: str, content: str):
+        self.role = USER if role == "user" else AI
+        self.content = content
+        # Clean tags (str.replace/strip return the same object when nothing changes)
+        self.shown = content.replace("<think>", "").replace("</think>", "").strip()
+
+    def __repr__(self):
+        return f"ChatRecord({self.role!r}, {self.content[:40]!r})"
+
+
+def role_of(message) -> str:
+    """``"user"`` / ``"ai"`` for a record, a stored dict or a LangChain message; None if unknown."""
+    if isinstance(message, ChatRecord):
+        return message.role
+    if isinstance(message, dict):
+        role = message.get("role")
+    else:
+        role = {"human": USER, "ai": AI}.get(getattr(message, "type", None))
+    if role == "user":
+        return USER
+    if role in ("ai", "assistant"):
+        return AI
+    return None
+
+
+def from_stored(messages: list) -> list:
+    """Records for a stored transcript (``{"role", "content"}`` dicts); other roles are skipped."""
+    records = []
+    for message in messages:
+        role = role_of(message)
+        if role:
+            records.append(ChatRecord(role, message.get("content", "")))
+    return records
+
+
+def to_stored(messages: list) -> list:
+    """``{"role", "content"}`` dicts, the format of the history database and saved chat files."""
+    stored = []
+    for message in messages:
+        role = role_of(message)
+        if role:
+            content = message.get("content", "") if isinstance(message, dict) else message.content
+            stored.append({"role": role, "content": content})
+    return stored
+
+
+def to_langchain(messages: list) -> list:
+    """LangChain messages for a model call; anything that is not a record passes through."""
+    converted = []
+    for message in messages:
+        if isinstance(message, ChatRecord):
+            message_type = HumanMessage if message.role == USER else AIMessage
+            converted.append(message_type(content=message.content))
+        else:
+            converted.append(message)
+    return converted
@@ -0,0 +1,28 @@
+import os
+
+# Settings are read when used rather than at import time, so values from .env
+# (loaded by main.py after the asset modules are imported) are always honoured.
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean setting such as STREAM_RESPONSES=1 / true / yes / on."""
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer setting, falling back to the default when unset or invalid."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float setting, falling back to the default when unset or invalid."""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,103 @@
+from langchain_core.messages import SystemMessage
+from .chat_records import AI, USER, role_of
+from collections import OrderedDict
+from .config import env_flag, env_int
+import threading
+import math
+
+# Defaults, overridable from .env
+DEFAULT_TOKEN_BUDGET = 6000      # CONTEXT_TOKEN_BUDGET: max prompt tokens sent per call
+DEFAULT_SUMMARY_TOKENS = 400     # CONTEXT_SUMMARY_TOKENS: share of the budget for the recap of dropped turns
+SNIPPET_CHARS = 120              # how much of each dropped message goes into the recap
+TOKEN_CACHE_SIZE = 20000
+
+# Token counts keyed by message identity. The message itself is kept in the entry
+# so its id() cannot be reused by another object while the count is cached.
+_token_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Estimate tokens for a piece of text (~4 characters per token for English/code)."""
+    return max(1, math.ceil(len(text or "") / 4))
+
+
+def message_tokens(message) -> int:
+    """Token count for one message, computed once and then served from the cache."""
+    key = id(message)
+    with _lock:
+        entry = _token_cache.get(key)
+        if entry is not None and entry[0] is message:
+            _token_cache.move_to_end(key)
+            return entry[1]
+
+    content = message.get("content", "") if isinstance(message, dict) else getattr(message, "content", "")
+    tokens = count_tokens(content if isinstance(content, str) else str(content)) + 4  # role/format overhead
+
+    with _lock:
+        _token_cache[key] = (message, tokens)
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return tokens
+
+
+def summarize_dropped(messages: list, max_tokens: int):
+    """Build a short recap of turns that no longer fit, newest first, within max_tokens."""
+    lines = []
+    used = 0
+    for message in reversed(messages):
+        speaker = "User" if role_of(message) == USER else "Assistant"
+        snippet = " ".join(message.content.split())[:SNIPPET_CHARS]
+        line = f"- {speaker}: {snippet}"
+        cost = count_tokens(line)
+        if used + cost > max_tokens:
+            break
+        lines.append(line)
+        used += cost
+
+    if not lines:
+        return None
+    lines.reverse()
+    return SystemMessage(content="Summary of earlier conversation (older turns omitted):\n" + "\n".join(lines))
+
+
+def fit_to_budget(messages: list, budget: int, summary_tokens: int = 0) -> list:
+    """Return the most recent messages that fit in ``budget`` tokens.
+
+    The newest message is always kept. When older turns are dropped and
+    ``summary_tokens`` is set, a recap of them is prepended as a system message.
+    """
+    if not messages:
+        return []
+
+    available = budget - summary_tokens if summary_tokens else budget
+    kept = []
+    used = 0
+    for index in range(len(messages) - 1, -1, -1):
+        tokens = message_tokens(messages[index])
+        if kept and used + tokens > available:
+            break
+        kept.append(messages[index])
+        used += tokens
+    else:
+        index = -1  # everything fits
+
+    kept.reverse()
+
+    # Don't open the window on a reply whose question was cut off
+    while len(kept) > 1 and role_of(kept[0]) == AI:
+        kept.pop(0)
+        index += 1
+
+    if index >= 0 and summary_tokens:
+        summary = summarize_dropped(messages[:index + 1], summary_tokens)
+        if summary is not None:
+            kept.insert(0, summary)
+    return kept
+
+
+def build_context(messages: list) -> list:
+    """Trim the chat history to the configured token budget before a model call."""
+    budget = env_int("CONTEXT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)
+    summary_tokens = env_int("CONTEXT_SUMMARY_TOKENS", DEFAULT_SUMMARY_TOKENS) if env_flag("CONTEXT_SUMMARY", True) else 0
+    return fit_to_budget(messages, budget, min(summary_tokens, budget // 2))
@@ -0,0 +1,361 @@
+from concurrent.futures import ThreadPoolExecutor
+from .config import env_flag, env_float, env_int
+import threading
+import hashlib
+import random
+import time
+import os
+
+# Defaults, overridable from .env
+MODEL_NAME = "deepseek-r1-distill-llama-70b"
+DEFAULT_MAX_CONCURRENCY = 8     # LLM_MAX_CONCURRENCY: upstream calls in flight across all sessions
+DEFAULT_MAX_QUEUE = 64          # LLM_MAX_QUEUE: calls allowed to wait for a free worker
+DEFAULT_PER_USER = 2            # LLM_PER_USER_CONCURRENCY: calls one user may have in flight or queued
+DEFAULT_TIMEOUT = 120.0         # LLM_TIMEOUT: seconds before a call is abandoned
+DEFAULT_MAX_RETRIES = 3         # LLM_MAX_RETRIES: retries on 429 / 5xx / connection errors
+DEFAULT_COALESCE = True         # LLM_COALESCE: identical in-flight requests share one upstream call
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APITimeoutError", "APIConnectionError", "ConnectError", "ReadTimeout", "ConnectTimeout"}
+
+
+class DispatcherBusy(RuntimeError):
+    """Raised when the dispatcher queue is full or a user already has too many calls pending."""
+
+
+class CallCancelled(RuntimeError):
+    """Ends an upstream stream that every caller stopped reading."""
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for rate limits, server errors and transport failures; False for 4xx client errors."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(error).__name__ in RETRYABLE_ERRORS or isinstance(error, (ConnectionError, TimeoutError))
+
+
+def request_key(messages) -> str:
+    """Identity of a request for coalescing: role and case/whitespace-normalized text of each message."""
+    parts = []
+    for message in messages:
+        role = message.get("role", "") if isinstance(message, dict) else getattr(message, "type", "")
+        content = message.get("content", "") if isinstance(message, dict) else getattr(message, "content", "")
+        parts.append(f"{role}\x1f{' '.join(str(content).split()).casefold()}")
+    return hashlib.sha1("\x1e".join(parts).encode("utf-8")).hexdigest()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max, base * 2**attempt)]."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def create_chat_model(api_key: str, base_url: str = None):
+    """Build the ChatGroq client on a shared, pooled HTTP connection.
+
+    Retries are disabled in the SDK because the dispatcher owns them. ``GROQ_BASE_URL``
+    points the client at another endpoint, e.g. the local fake used by the benchmarks.
+    """
+    from langchain_groq import ChatGroq
+    import httpx
+
+    max_connections = env_int("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(env_float("LLM_TIMEOUT", DEFAULT_TIMEOUT), connect=10.0)
+    )
+    options = {}
+    base_url = base_url or os.getenv("GROQ_BASE_URL")
+    if base_url:
+        options["base_url"] = base_url
+    return ChatGroq(api_key=api_key, model_name=MODEL_NAME, max_retries=0, http_client=http_client, **options)
+
+
+class LLMDispatcher:
+    """Shared gateway for model calls from every Streamlit session.
+
+    A fixed worker pool caps upstream concurrency, a bounded admission queue sheds load
+    instead of piling up, and per-user slots stop one user from taking every worker.
+    Calls time out and are retried with jittered backoff on 429/5xx. Identical requests
+    that arrive while one is already running join it instead of calling upstream again.
+    ``stream`` and ``invoke`` mirror the LangChain chat model interface.
+    """
+
+    def __init__(self, chat_model, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_queue: int = DEFAULT_MAX_QUEUE,
+                 per_user: int = DEFAULT_PER_USER, timeout: float = DEFAULT_TIMEOUT, max_retries: int = DEFAULT_MAX_RETRIES,
+                 coalesce: bool = DEFAULT_COALESCE):
+        self.chat_model = chat_model
+        self.coalesce = coalesce
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.per_user = max(1, per_user)
+
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="nexa-llm")
+        self._admission = threading.BoundedSemaphore(max(1, max_concurrency) + max(0, max_queue))
+        self._user_calls = {}  # user -> calls admitted and not yet released (idle users are dropped)
+        self._user_lock = threading.Lock()
+        self._flights = {}  # request key -> _Flight for calls currently in progress
+        self._flights_lock = threading.Lock()
+
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "in_flight": 0, "queued": 0, "completed": 0, "failed": 0,
+            "retries": 0, "rejected": 0, "coalesced": 0, "cancelled": 0
+        }
+
+    # -------------------- public API --------------------
+
+    def for_user(self, user: str):
+        """Return a view of this dispatcher whose calls count against ``user``'s slots."""
+        return _UserBoundDispatcher(self, user)
+
+    def stream(self, messages, user: str = None):
+        """Yield model chunks as they arrive; identical concurrent requests share one upstream stream."""
+        flight, leader = self._join("stream", messages)
+        if leader:
+            self._launch(flight, user, self._run_stream, messages, flight)
+        try:
+            yield from flight.follow(time.monotonic() + self.timeout, self.timeout)
+        finally:
+            self._leave(flight)  # the upstream call stops early once nobody is reading it
+
+    def invoke(self, messages, user: str = None):
+        """Run a blocking call on the pool and return the model's message."""
+        flight, leader = self._join("invoke", messages)
+        if leader:
+            self._launch(flight, user, self._run_invoke, messages, flight)
+        try:
+            for result in flight.follow(time.monotonic() + self.timeout, self.timeout):
+                return result
+            raise RuntimeError("Model call ended without a reply")
+        finally:
+            self._leave(flight)
+
+    def metrics(self) -> dict:
+        """Snapshot of in-flight, queued, completed, failed, cancelled, retried and rejected calls."""
+        with self._metrics_lock:
+            return dict(self._metrics)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # -------------------- internals --------------------
+
+    def _count(self, name: str, delta: int = 1):
+        with self._metrics_lock:
+            self._metrics[name] += delta
+
+    def _join(self, kind: str, messages):
+        """Return ``(flight, is_leader)``: an in-progress identical call to follow, or a new one to start."""
+        key = (kind, request_key(messages)) if self.coalesce else None
+        with self._flights_lock:
+            flight = self._flights.get(key) if key else None
+            if flight is not None and not flight.cancelled.is_set():
+                flight.subscribers += 1
+                self._count("coalesced")
+                return flight, False
+            flight = _Flight(key)
+            if key:
+                self._flights[key] = flight
+            return flight, True
+
+    def _leave(self, flight):
+        """Drop one reader; the last one cancels the call.
+
+        Runs under the same lock as ``_join`` so a caller can never attach to a flight
+        that is being cancelled (it would see the stream end early with no error).
+        """
+        with self._flights_lock:
+            flight.subscribers -= 1
+            if flight.subscribers <= 0 and not flight.done:
+                flight.cancelled.set()
+                if flight.key and self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+
+    def _finish(self, flight, error: Exception = None):
+        """Publish the outcome to every follower and stop routing new callers to this flight."""
+        with self._flights_lock:
+            if flight.key and self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.finish(error)
+
+    def _launch(self, flight, user, target, *args):
+        """Admit the leading caller and start the upstream call on the pool."""
+        try:
+            release = self._admit(user)
+        except Exception as e:
+            self._finish(flight, e)
+            return
+        try:
+            self._pool.submit(target, *args, release)
+        except Exception as e:
+            release()
+            self._finish(flight, e)
+
+    def _admit(self, user):
+        """Reserve a per-user slot and a place in the pool; returns the matching release callback."""
+        # Both limits reject at once: waiting would hold the user's script thread behind "thinking..."
+        with self._user_lock:
+            calls = self._user_calls.get(user, 0)
+            if calls >= self.per_user:
+                self._count("rejected")
+                raise DispatcherBusy("You already have requests in progress, please wait.")
+            self._user_calls[user] = calls + 1
+        if not self._admission.acquire(blocking=False):
+            self._release_user(user)
+            self._count("rejected")
+            raise DispatcherBusy("Nexa is busy right now, please try again in a moment.")
+
+        self._count("queued")
+        released = threading.Event()
+
+        def release():
+            if not released.is_set():
+                released.set()
+                self._admission.release()
+                self._release_user(user)
+
+        return release
+
+    def _release_user(self, user):
+        with self._user_lock:
+            calls = self._user_calls.get(user, 0) - 1
+            if calls > 0:
+                self._user_calls[user] = calls
+            else:
+                self._user_calls.pop(user, None)
+
+    def _with_retries(self, call, can_retry=lambda: True):
+        attempt = 0
+        while True:
+            try:
+                return call()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e) or not can_retry():
+                    raise
+                self._count("retries")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+
+    def _run_invoke(self, messages, flight, release):
+        self._count("queued", -1)
+        self._count("in_flight")
+        try:
+            result = self._with_retries(lambda: self.chat_model.invoke(messages))
+            self._count("completed")
+            flight.publish(result)
+            self._finish(flight)
+        except Exception as e:
+            self._count("failed")
+            self._finish(flight, e)
+        finally:
+            self._count("in_flight", -1)
+            release()
+
+    def _run_stream(self, messages, flight, release):
+        self._count("queued", -1)
+        self._count("in_flight")
+
+        def call():
+            for chunk in self.chat_model.stream(messages):
+                if flight.cancelled.is_set():
+                    raise CallCancelled("Every caller left before the reply finished")
+                flight.publish(chunk)
+
+        try:
+            # Once tokens have been shown, a retry would duplicate them, so only retry before the first chunk
+            self._with_retries(call, can_retry=lambda: not flight.started and not flight.cancelled.is_set())
+            self._count("completed")
+            self._finish(flight)
+        except CallCancelled as e:
+            self._count("cancelled")
+            self._finish(flight, e)
+        except Exception as e:
+            self._count("failed")
+            self._finish(flight, e)
+        finally:
+            self._count("in_flight", -1)
+            release()
+
+
+class _Flight:
+    """One upstream call and everything it has produced so far, readable by several callers."""
+
+    def __init__(self, key):
+        self.key = key
+        self.subscribers = 1
+        self.cancelled = threading.Event()
+        self._items = []
+        self._done = False
+        self._error = None
+        self._cond = threading.Condition()
+
+    @property
+    def started(self) -> bool:
+        return bool(self._items)
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def publish(self, item):
+        with self._cond:
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def finish(self, error: Exception = None):
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def follow(self, deadline: float, timeout: float):
+        """Yield every item from the start (late joiners replay what they missed) until the call ends."""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self._items) and not self._done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Model call exceeded {timeout:.0f}s")
+                    self._cond.wait(remaining)
+                items = self._items[index:]
+                index = len(self._items)
+                done, error = self._done, self._error
+
+            yield from items
+            if done and index == len(self._items):
+                if error is not None:
+                    raise error
+                return
+
+
+class _UserBoundDispatcher:
+    """Chat-model-shaped wrapper that passes a fixed user to the dispatcher."""
+
+    def __init__(self, dispatcher: LLMDispatcher, user: str):
+        self._dispatcher = dispatcher
+        self._user = user
+
+    def stream(self, messages):
+        return self._dispatcher.stream(messages, user=self._user)
+
+    def invoke(self, messages):
+        return self._dispatcher.invoke(messages, user=self._user)
+
+
+def create_dispatcher(api_key: str) -> LLMDispatcher:
+    """Build the ChatGroq client and the dispatcher around it from .env settings."""
+    return LLMDispatcher(
+        create_chat_model(api_key),
+        max_concurrency=env_int("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY),
+        max_queue=env_int("LLM_MAX_QUEUE", DEFAULT_MAX_QUEUE),
+        per_user=env_int("LLM_PER_USER_CONCURRENCY", DEFAULT_PER_USER),
+        timeout=env_float("LLM_TIMEOUT", DEFAULT_TIMEOUT),
+        max_retries=env_int("LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES),
+        coalesce=env_flag("LLM_COALESCE", DEFAULT_COALESCE)
+    )
@@ -0,0 +1,77 @@
+from .custom_responses import CUSTOM_RESPONSES
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton that finds the longest keyword in a text in one pass.
+
+    Matching is case-insensitive substring matching, like ``key.lower() in text.lower()``.
+    When several keywords occur, the longest wins; ties go to the earliest occurrence,
+    then to the keyword that was added first.
+    """
+
+    def __init__(self, keywords):
+        self._goto = [{}]     # node -> {char: next node}
+        self._fail = [0]      # node -> failure link
+        self._best = [None]   # node -> (length, order, keyword) of the longest keyword ending here
+        for order, keyword in enumerate(keywords):
+            self._add(keyword, order)
+        self._build_links()
+
+    def _add(self, keyword: str, order: int):
+        node = 0
+        lowered = keyword.lower()
+        for char in lowered:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            node = nxt
+        if lowered and self._best[node] is None:
+            self._best[node] = (len(lowered), order, keyword)
+
+    def _build_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                link = self._goto[fallback].get(char, 0)
+                self._fail[child] = link if link != child else 0
+
+                # Inherit the longest keyword reachable through the failure link
+                inherited = self._best[self._fail[child]]
+                own = self._best[child]
+                if own is None or (inherited is not None and inherited[0] > own[0]):
+                    self._best[child] = inherited
+
+    def search(self, text: str):
+        """Return the best matching keyword (as originally given), or None."""
+        goto, fail, best_at = self._goto, self._fail, self._best
+        node = 0
+        best = None
+        for char in text.lower():
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            found = best_at[node]
+            if found is not None and (best is None or found[0] > best[0]):
+                best = found
+        return best[2] if best else None
+
+
+# Built once at import time
+CUSTOM_RESPONSE_MATCHER = KeywordMatcher(CUSTOM_RESPONSES)
+
+
+def find_custom_response(prompt: str):
+    """Return the canned answer for the most specific CUSTOM_RESPONSES key in the prompt, or None."""
+    key = CUSTOM_RESPONSE_MATCHER.search(prompt)
+    return CUSTOM_RESPONSES[key] if key is not None else None
@@ -0,0 +1,282 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .config import env_float, env_int
+import functools
+import threading
+import logging
+import bisect
+import time
+import json
+import os
+
+# Defaults, overridable from .env
+DEFAULT_PORT = 0               # METRICS_PORT: serve /metrics (Prometheus text) and /metrics.json; 0 = off
+DEFAULT_FILE_INTERVAL = 10.0   # METRICS_FILE_INTERVAL: seconds between JSON snapshots when METRICS_FILE is set
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+HELP = {
+    "nexa_stage_seconds": "Time spent in each stage of a rerun or chat turn.",
+    "nexa_answers_total": "Replies by source: custom (canned), cache_exact, cache_similar or llm.",
+    "nexa_response_cache_total": "Response cache lookups by result.",
+    "nexa_loader_cache_total": "Shared loader cache lookups (history, saved chats) by result.",
+    "nexa_llm_seconds": "Model call latency, from request to last token.",
+    "nexa_llm_first_token_seconds": "Time to the first streamed token.",
+    "nexa_llm_tokens": "Estimated tokens per model call, by direction.",
+    "nexa_errors_total": "Errors surfaced to the user, by stage.",
+}
+
+logger = logging.getLogger(__name__)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class Registry:
+    """In-process store of counters, histograms and gauge callbacks.
+
+    Series are keyed by metric name plus sorted label pairs. Updates take one lock and
+    a dict lookup, so recording costs a few microseconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}     # (name, labels) -> float
+        self._histograms = {}   # (name, labels) -> _Histogram
+        self._gauges = {}       # prefix -> callable returning {field: number}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.counts[bisect.bisect_left(histogram.buckets, value)] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    def register_gauges(self, prefix: str, collect):
+        """Expose the numeric fields of ``collect()`` (e.g. a component's metrics()) as gauges."""
+        with self._lock:
+            self._gauges[prefix] = collect
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # -------------------- export --------------------
+
+    def _collect_gauges(self) -> dict:
+        with self._lock:
+            sources = list(self._gauges.items())
+        gauges = {}
+        for prefix, collect in sources:
+            try:
+                values = collect()
+            except Exception:
+                logger.exception("Gauge collector %s failed", prefix)
+                continue
+            for field, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges[f"{prefix}_{field}"] = value
+        return gauges
+
+    def snapshot(self) -> dict:
+        """Plain-dict view of every series, suitable for JSON."""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+            histograms = [
+                {
+                    "name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                    "buckets": {str(bound): n for bound, n in zip(h.buckets + ("+Inf",), _cumulative(h.counts))}
+                }
+                for (name, labels), h in self._histograms.items()
+            ]
+        return {"timestamp": time.time(), "counters": counters, "histograms": histograms,
+                "gauges": self._collect_gauges()}
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        for (name, labels), h in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+            for bound, count in zip(h.buckets + ("+Inf",), _cumulative(h.counts)):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(h.sum)}")
+            lines.append(f"{name}_count{_labels(labels)} {h.count}")
+
+        for name, value in sorted(self._collect_gauges().items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str):
+        """Write a snapshot atomically (readers never see a half-written file)."""
+        from .storage import atomic_write_json
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        atomic_write_json(path, self.snapshot(), indent=2)
+
+
+def _cumulative(counts: list) -> list:
+    total, result = 0, []
+    for count in counts:
+        total += count
+        result.append(total)
+    return result
+
+
+def _number(value) -> str:
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# -------------------- ⏱️ SPANS --------------------
+
+REGISTRY = Registry()
+
+
+class span:
+    """Time a block into ``nexa_stage_seconds{stage=...}``; usable as ``with span("sidebar"):``.
+
+    Exceptions still record the time (Streamlit's st.rerun() raises to stop a run) and
+    are re-raised; ``elapsed`` holds the duration in seconds after the block.
+    """
+
+    __slots__ = ("stage", "started", "elapsed")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        REGISTRY.observe("nexa_stage_seconds", self.elapsed, stage=self.stage)
+        return False
+
+
+def timed(stage: str):
+    """Decorator form of ``span``; also covers calls that run on their own (Streamlit fragment reruns)."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def inc(name: str, value: float = 1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+    REGISTRY.observe(name, value, buckets, **labels)
+
+
+def register_gauges(prefix: str, collect):
+    REGISTRY.register_gauges(prefix, collect)
+
+
+# -------------------- 📤 EXPORTERS --------------------
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body = json.dumps(REGISTRY.snapshot()).encode("utf-8")
+            content_type = "application/json"
+        elif self.path.startswith("/metrics"):
+            body = REGISTRY.render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_exporters():
+    """Start the optional exporters once per process: METRICS_PORT (HTTP) and METRICS_FILE (JSON)."""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+
+    port = env_int("METRICS_PORT", DEFAULT_PORT)
+    if port:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="nexa-metrics-http", daemon=True).start()
+        except OSError:
+            logger.exception("Could not serve metrics on port %s", port)
+
+    path = os.getenv("METRICS_FILE")
+    if path:
+        interval = env_float("METRICS_FILE_INTERVAL", DEFAULT_FILE_INTERVAL)
+
+        def write_forever():
+            while True:
+                time.sleep(interval)
+                try:
+                    REGISTRY.write_json(path)
+                except Exception:
+                    logger.exception("Could not write metrics to %s", path)
+
+        threading.Thread(target=write_forever, name="nexa-metrics-file", daemon=True).start()
@@ -0,0 +1,164 @@
+from .config import env_flag, env_float, env_int
+import functools
+import threading
+import datetime
+import logging
+import time
+import os
+import re
+
+# Defaults, overridable from .env
+DEFAULT_THRESHOLD_MS = 500     # PROFILE_THRESHOLD_MS: keep a profile only when the call took at least this long
+DEFAULT_DIR = "profiles"       # PROFILE_DIR: where .prof / .collapsed files are written
+DEFAULT_MAX_MB = 50            # PROFILE_MAX_MB: oldest profiles are deleted beyond this total size
+DEFAULT_PROFILER = "auto"      # PROFILER: auto (pyinstrument if installed, else cProfile), cprofile or pyinstrument
+
+logger = logging.getLogger(__name__)
+
+# Set by configure(); profiling stays off until main.py turns it on with PROFILE=1
+_enabled = False
+_active = threading.local()    # a profile is already running on this thread (nested wrapped calls)
+
+
+def configure(enabled: bool = None):
+    """Turn profiling on or off; by default from the PROFILE env var (read once, after load_dotenv)."""
+    global _enabled
+    _enabled = env_flag("PROFILE", False) if enabled is None else enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+# -------------------- 🔬 PROFILER BACKENDS --------------------
+
+class _CProfileBackend:
+    """Deterministic profiler from the standard library; saves a .prof file (pstats / snakeviz)."""
+
+    def start(self):
+        import cProfile
+        self._profile = cProfile.Profile()
+        self._profile.enable()  # raises ValueError if another profiler already owns this thread
+
+    def stop(self):
+        self._profile.disable()
+
+    def save(self, base_path: str) -> list:
+        self._profile.dump_stats(base_path + ".prof")
+        return [base_path + ".prof"]
+
+
+class _PyinstrumentBackend:
+    """Sampling profiler (low overhead); saves collapsed stacks (flamegraph.pl / speedscope) and HTML."""
+
+    def start(self):
+        from pyinstrument import Profiler
+        self._profiler = Profiler(interval=0.001)
+        self._profiler.start()
+
+    def stop(self):
+        self._session = self._profiler.stop()
+
+    def save(self, base_path: str) -> list:
+        with open(base_path + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, micros in _collapse(self._session.root_frame()):
+                f.write(f"{stack} {micros}\n")
+        with open(base_path + ".html", "w", encoding="utf-8") as f:
+            f.write(self._profiler.output_html())
+        return [base_path + ".collapsed", base_path + ".html"]
+
+
+def _collapse(frame, prefix: str = ""):
+    """Yield ``("outer;inner;leaf", self_time_us)`` lines from a pyinstrument frame tree."""
+    if frame is None:
+        return
+    name = f"{frame.function} ({frame.file_path_short}:{frame.line_no})"
+    stack = f"{prefix};{name}" if prefix else name
+    self_time = frame.time - sum(child.time for child in frame.children)
+    if self_time > 0:
+        yield stack, max(1, round(self_time * 1_000_000))
+    for child in frame.children:
+        yield from _collapse(child, stack)
+
+
+def _new_backend():
+    choice = (os.getenv("PROFILER") or DEFAULT_PROFILER).lower()
+    if choice in ("auto", "pyinstrument"):
+        try:
+            import pyinstrument  # noqa: F401
+            return _PyinstrumentBackend()
+        except ImportError:
+            if choice == "pyinstrument":
+                logger.warning("PROFILER=pyinstrument but pyinstrument is not installed; using cProfile")
+    return _CProfileBackend()
+
+
+# -------------------- 🗂️ ROTATING OUTPUT --------------------
+
+def _save(backend, label: str, elapsed: float):
+    directory = os.getenv("PROFILE_DIR") or DEFAULT_DIR
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    safe_label = re.sub(r"[^A-Za-z0-9_.-]+", "_", label)
+    base_path = os.path.join(directory, f"{stamp}_{safe_label}_{elapsed * 1000:.0f}ms")
+    try:
+        written = backend.save(base_path)
+        logger.info("Slow %s (%.0f ms) profiled to %s", label, elapsed * 1000, ", ".join(written))
+    except Exception:
+        logger.exception("Could not save profile for %s", label)
+    prune(directory, env_float("PROFILE_MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024)
+
+
+def prune(directory: str, max_bytes: float):
+    """Delete the oldest profile files until the directory is under max_bytes."""
+    files = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith((".prof", ".collapsed", ".html")):
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+# -------------------- 🎯 DECORATOR --------------------
+
+def profiled(label: str):
+    """Profile calls of the wrapped function when profiling is on; keep only slow ones.
+
+    Only the outermost wrapped call on a thread is profiled (render_bot contains
+    render_main_chat_ui), so nested wrappers just run.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled or getattr(_active, "running", False):
+                return func(*args, **kwargs)
+
+            backend = _new_backend()
+            try:
+                backend.start()
+            except Exception:
+                return func(*args, **kwargs)  # another profiler (e.g. an outer cProfile run) is active
+
+            _active.running = True
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                _active.running = False
+                try:
+                    backend.stop()
+                    if elapsed * 1000 >= env_int("PROFILE_THRESHOLD_MS", DEFAULT_THRESHOLD_MS):
+                        _save(backend, label, elapsed)
+                except Exception:
+                    logger.exception("Profiling %s failed", label)
+        return wrapper
+    return decorator
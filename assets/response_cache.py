@@ -0,0 +1,235 @@
+from collections import Counter, OrderedDict
+from .config import env_flag, env_float, env_int
+from . import metrics
+import numpy as np
+import threading
+import hashlib
+import time
+import zlib
+import re
+
+# Defaults, overridable from .env
+DEFAULT_TTL = 3600           # RESPONSE_CACHE_TTL: seconds an answer stays reusable
+DEFAULT_SIZE = 1000          # RESPONSE_CACHE_SIZE: max cached answers (least recently used are evicted)
+DEFAULT_THRESHOLD = 0.92     # RESPONSE_CACHE_THRESHOLD: cosine similarity needed for a fuzzy hit
+DEFAULT_CONTEXT_TURNS = 2    # RESPONSE_CACHE_CONTEXT_TURNS: earlier messages that must match too
+VECTOR_DIM = 2048            # hashed TF-IDF feature space
+TRAILING_PUNCTUATION = set(".?!,;:")
+
+
+# -------------------- 🧹 NORMALIZATION --------------------
+
+def normalize_text(text: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivial variations share a key.
+
+    Operators and other symbols are kept as tokens of their own: "2+2" and "2*2", or
+    "C++" and "C#", are different questions.
+    """
+    tokens = re.findall(r"\w+|[^\w\s]", (text or "").lower())
+    while tokens and tokens[-1] in TRAILING_PUNCTUATION:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def _content(message) -> str:
+    if isinstance(message, dict):
+        return message.get("content", "")
+    return getattr(message, "content", "")
+
+
+def split_request(messages: list, context_turns: int):
+    """Return (normalized prompt, context key) for the last message and the turns before it."""
+    prompt = normalize_text(_content(messages[-1])) if messages else ""
+    context = [normalize_text(_content(m)) for m in messages[-1 - context_turns:-1]] if context_turns else []
+    context_key = hashlib.sha1("\x1e".join(context).encode("utf-8")).hexdigest()
+    return prompt, context_key
+
+
+def _features(prompt: str) -> Counter:
+    """Hashed unigram + bigram counts for a normalized prompt."""
+    words = prompt.split()
+    terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return Counter(zlib.crc32(term.encode("utf-8")) % VECTOR_DIM for term in terms)
+
+
+# -------------------- 🗃️ CACHE --------------------
+
+class ResponseCache:
+    """Two-tier answer cache: exact normalized match first, then TF-IDF cosine similarity.
+
+    Entries expire after ``ttl`` seconds and the least recently used entry is evicted
+    once ``max_entries`` is reached. Only entries with the same trimmed context are
+    considered similar, so a follow-up question is never answered out of context.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_SIZE, ttl: float = DEFAULT_TTL,
+                 threshold: float = DEFAULT_THRESHOLD, context_turns: int = DEFAULT_CONTEXT_TURNS):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.threshold = threshold
+        self.context_turns = context_turns
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # exact key -> entry dict, in LRU order
+        self._vectors = np.zeros((self.max_entries, VECTOR_DIM), dtype=np.float32)
+        self._active = np.zeros(self.max_entries, dtype=bool)
+        self._slot_context = np.full(self.max_entries, None, dtype=object)
+        self._slot_key = [None] * self.max_entries
+        self._doc_freq = np.zeros(VECTOR_DIM, dtype=np.float32)
+        self._free = list(range(self.max_entries - 1, -1, -1))
+        self._weights = None  # (idf, IDF-weighted row norms), rebuilt on the first lookup after a change
+
+    def _key(self, prompt: str, context_key: str) -> str:
+        return f"{context_key}:{prompt}"
+
+    def _idf(self) -> np.ndarray:
+        count = float(self._active.sum())
+        return np.log((1.0 + count) / (1.0 + self._doc_freq)) + 1.0
+
+    def _idf_and_norms(self):
+        """IDF and each row's IDF-weighted norm; cached until the next put/_remove."""
+        if self._weights is None:
+            idf = self._idf()
+            norms = np.sqrt(np.einsum("ij,ij,j->i", self._vectors, self._vectors, idf * idf))
+            norms[norms == 0] = 1.0
+            self._weights = (idf, norms)
+        return self._weights
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        slot = entry["slot"]
+        self._doc_freq -= self._vectors[slot] > 0
+        self._vectors[slot] = 0.0
+        self._active[slot] = False
+        self._slot_context[slot] = None
+        self._slot_key[slot] = None
+        self._free.append(slot)
+        self._weights = None
+
+    def get(self, messages: list):
+        """Return ``(response, tier)`` for a cached answer, where tier is "exact" or "similar"; else None."""
+        if not messages:
+            return None
+        prompt, context_key = split_request(messages, self.context_turns)
+        if not prompt:
+            return None
+        key = self._key(prompt, context_key)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry["expires"] > now:
+                    self._entries.move_to_end(key)
+                    return entry["response"], "exact"
+                self._remove(key)
+
+            if not self._active.any():
+                return None
+
+            query = np.zeros(VECTOR_DIM, dtype=np.float32)
+            for index, count in _features(prompt).items():
+                query[index] = count
+            idf, norms = self._idf_and_norms()
+            query *= idf
+            query_norm = np.linalg.norm(query)
+            if query_norm == 0:
+                return None
+
+            # (V * idf) @ (q * idf) == V @ (q * idf * idf): no weighted copy of the matrix
+            scores = (self._vectors @ (query * idf)) / (norms * query_norm)
+            mask = self._active & (self._slot_context == context_key)
+            scores[~mask] = -1.0
+
+            slot = int(scores.argmax())
+            if scores[slot] < self.threshold:
+                return None
+
+            match_key = self._slot_key[slot]
+            match = self._entries[match_key]
+            if match["expires"] <= now:
+                self._remove(match_key)
+                return None
+            self._entries.move_to_end(match_key)
+            return match["response"], "similar"
+
+    def put(self, messages: list, response: str):
+        """Cache the answer for the last message of ``messages``."""
+        if not messages or not response:
+            return
+        prompt, context_key = split_request(messages, self.context_turns)
+        if not prompt:
+            return
+        key = self._key(prompt, context_key)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if not self._free:
+                self._remove(next(iter(self._entries)))  # least recently used
+
+            slot = self._free.pop()
+            for index, count in _features(prompt).items():
+                self._vectors[slot, index] = count
+            self._doc_freq += self._vectors[slot] > 0
+            self._active[slot] = True
+            self._slot_context[slot] = context_key
+            self._slot_key[slot] = key
+            self._entries[key] = {"slot": slot, "response": response, "expires": time.monotonic() + self.ttl}
+            self._weights = None
+
+    def clear(self):
+        """Forget every cached answer."""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# -------------------- 📊 DEFLECTION STATS --------------------
+
+# How each reply was produced: "custom" (CUSTOM_RESPONSES), "cache_exact", "cache_similar" or "llm"
+DEFLECTION_STATS = Counter()
+_stats_lock = threading.Lock()
+
+
+def record_answer_source(source: str):
+    """Count where a reply came from."""
+    with _stats_lock:
+        DEFLECTION_STATS[source] += 1
+
+
+def deflection_rate() -> float:
+    """Share of replies served without calling the model (canned answers + cache hits)."""
+    with _stats_lock:
+        total = sum(DEFLECTION_STATS.values())
+        return (total - DEFLECTION_STATS["llm"]) / total if total else 0.0
+
+
+# Exported as the nexa_answers_deflection_rate gauge on /metrics and /metrics.json
+metrics.register_gauges("nexa_answers", lambda: {"deflection_rate": deflection_rate()})
+
+
+# -------------------- ⚙️ SHARED INSTANCE --------------------
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide cache if RESPONSE_CACHE=1, otherwise None (the cache is opt-in)."""
+    global _shared_cache
+    if not env_flag("RESPONSE_CACHE", False):
+        return None
+
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(
+                max_entries=env_int("RESPONSE_CACHE_SIZE", DEFAULT_SIZE),
+                ttl=env_float("RESPONSE_CACHE_TTL", DEFAULT_TTL),
+                threshold=env_float("RESPONSE_CACHE_THRESHOLD", DEFAULT_THRESHOLD),
+                context_turns=env_int("RESPONSE_CACHE_CONTEXT_TURNS", DEFAULT_CONTEXT_TURNS)
+            )
+        return _shared_cache
@@ -1,14 +1,10 @@
 import streamlit as st
-import pandas as pd
-
-def load_user_data():
-    try:
-        return pd.read_csv("users.csv")
-    except FileNotFoundError:
-        return pd.DataFrame(columns=["email", "username", "password"])
+from .write_behind import flush_history_writes
+from .storage import user_history_db
 
 def logout_user():
-    keys_to_clear = ["logged_in_user", "page_option", "chat_history", "input_question", "chat_input"]
+    flush_history_writes(user_history_db(st.session_state.get("logged_in_user")))  # don't leave the user's last turns sitting in the write-behind queue
+    keys_to_clear = ["logged_in_user", "page_option", "chat_history", "cid", "history_saved", "input_question", "chat_input"]
     for key in keys_to_clear:
         st.session_state.pop(key, None)
     st.success("✅ You have been logged out.")
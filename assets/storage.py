@@ -0,0 +1,656 @@
+from contextlib import contextmanager
+import sqlite3
+import threading
+import tempfile
+import hashlib
+import json
+import os
+import re
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are still serialized within this process
+    fcntl = None
+
+# Constants
+HISTORY_DB = "archived/chats_history/history.db"
+LEGACY_HISTORY_FILE = "archived/chats_history/history.json"
+SAVED_CHAT_DIR = "archived/saved_chats"
+MANIFEST_NAME = ".manifest"  # no .json suffix, so it is never mistaken for a saved chat
+SEARCH_HITS = 500  # best-ranked messages grouped into chats per search (widened when a page needs more)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    cid       TEXT PRIMARY KEY,
+    title     TEXT NOT NULL,
+    hash      TEXT,  -- content hash carried over from history.json; not maintained for new turns
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chats_timestamp ON chats(timestamp);
+
+CREATE TABLE IF NOT EXISTS messages (
+    cid     TEXT NOT NULL REFERENCES chats(cid) ON DELETE CASCADE,
+    seq     INTEGER NOT NULL,
+    role    TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (cid, seq)
+) WITHOUT ROWID;
+"""
+
+# Full-text index over chat titles and messages. Rows of chat_search share their rowid with
+# search_docs, which says which chat ("history" or "saved" source) and message (seq, -1 for
+# the title) they belong to. History rows are kept in sync by triggers, so every append —
+# including the write-behind queue — is indexed in the same transaction.
+SEARCH_DOCS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_docs (
+    docid  INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    cid    TEXT NOT NULL,
+    seq    INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_search_docs_chat ON search_docs(source, cid, seq);
+"""
+
+SEARCH_FTS_TABLE = "CREATE VIRTUAL TABLE chat_search USING fts5(title, content, tokenize='unicode61 remove_diacritics 2')"
+SEARCH_PLAIN_TABLE = "CREATE TABLE chat_search (title TEXT, content TEXT)"  # LIKE fallback without FTS5
+
+SEARCH_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS search_chat_insert AFTER INSERT ON chats BEGIN
+    DELETE FROM chat_search WHERE rowid IN
+        (SELECT docid FROM search_docs WHERE source = 'history' AND cid = new.cid AND seq = -1);
+    DELETE FROM search_docs WHERE source = 'history' AND cid = new.cid AND seq = -1;
+    INSERT INTO search_docs (source, cid, seq) VALUES ('history', new.cid, -1);
+    INSERT INTO chat_search (rowid, title, content) VALUES (last_insert_rowid(), new.title, '');
+END;
+CREATE TRIGGER IF NOT EXISTS search_chat_title AFTER UPDATE OF title ON chats BEGIN
+    UPDATE chat_search SET title = new.title WHERE rowid IN
+        (SELECT docid FROM search_docs WHERE source = 'history' AND cid = new.cid AND seq = -1);
+END;
+CREATE TRIGGER IF NOT EXISTS search_chat_delete AFTER DELETE ON chats BEGIN
+    DELETE FROM chat_search WHERE rowid IN
+        (SELECT docid FROM search_docs WHERE source = 'history' AND cid = old.cid AND seq = -1);
+    DELETE FROM search_docs WHERE source = 'history' AND cid = old.cid AND seq = -1;
+END;
+CREATE TRIGGER IF NOT EXISTS search_message_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO search_docs (source, cid, seq) VALUES ('history', new.cid, new.seq);
+    INSERT INTO chat_search (rowid, title, content) VALUES (last_insert_rowid(), '', new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS search_message_delete AFTER DELETE ON messages BEGIN
+    DELETE FROM chat_search WHERE rowid IN
+        (SELECT docid FROM search_docs WHERE source = 'history' AND cid = old.cid AND seq = old.seq);
+    DELETE FROM search_docs WHERE source = 'history' AND cid = old.cid AND seq = old.seq;
+END;
+"""
+
+# One connection per (thread, database). Streamlit runs every rerun on a new script thread,
+# so a connection lives for one rerun and is closed when its thread's locals are freed;
+# the schema and trigger scripts only run the first time this process opens a database.
+_local = threading.local()
+_prepared = set()               # absolute paths of databases whose schema this process applied
+_prepared_lock = threading.Lock()
+
+
+# -------------------- 🗄️ CONNECTION --------------------
+
+def open_database(db_path: str, schema: str, prepare=None) -> sqlite3.Connection:
+    """Return this thread's WAL-mode connection to db_path.
+
+    ``schema`` (and then ``prepare(conn)``) run once per database per process, or again
+    if the file has been deleted since.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is not None:
+        return conn
+
+    key = os.path.abspath(db_path)
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    with _prepared_lock:
+        first_open = key not in _prepared or not os.path.exists(db_path)
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    connections[db_path] = conn  # before prepare(), which may ask for this connection again
+
+    if first_open:
+        conn.execute("PRAGMA journal_mode=WAL")  # persistent: stored in the database file
+        conn.executescript(schema)
+        if prepare:
+            prepare(conn)
+        with _prepared_lock:
+            _prepared.add(key)
+    return conn
+
+
+def get_connection(db_path: str = HISTORY_DB) -> sqlite3.Connection:
+    """Return this thread's connection to the history database, creating it on first use."""
+    connections = getattr(_local, "connections", None)
+    if connections is not None and db_path in connections:
+        return connections[db_path]
+
+    def prepare(conn):
+        ensure_search_index(conn)
+        # One-shot import of the old whole-file history, if it is still around
+        legacy_file = os.path.join(os.path.dirname(db_path), os.path.basename(LEGACY_HISTORY_FILE))
+        if os.path.exists(legacy_file):
+            migrate_history_json(legacy_file, db_path)
+
+    return open_database(db_path, SCHEMA, prepare)
+
+
+# -------------------- 🔒 LOCKING & ATOMIC WRITES --------------------
+
+_path_locks = {}        # absolute path -> RLock shared by every thread in this process
+_path_depth = {}        # absolute path -> re-entry depth (the file lock is taken only once)
+_path_locks_guard = threading.Lock()
+
+
+@contextmanager
+def locked(path: str):
+    """Serialize writers of ``path`` across threads and processes.
+
+    A per-path re-entrant lock covers sessions in this server; an ``fcntl`` advisory
+    lock on ``path + ".lock"`` covers other processes sharing the same files.
+    """
+    key = os.path.abspath(path)
+    with _path_locks_guard:
+        lock = _path_locks.setdefault(key, threading.RLock())
+
+    with lock:
+        depth = _path_depth.get(key, 0)
+        _path_depth[key] = depth + 1
+        try:
+            if depth or fcntl is None:
+                yield
+                return
+
+            os.makedirs(os.path.dirname(key), exist_ok=True)
+            with open(key + ".lock", "a") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+        finally:
+            _path_depth[key] = depth
+
+
+def atomic_write_json(path: str, data, **dump_kwargs):
+    """Write JSON to a temp file in the same folder, fsync it, then os.replace it over ``path``.
+
+    Readers see either the old or the new file, never a truncated one.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# -------------------- 👤 PER-USER SHARDS --------------------
+
+def user_key(user: str) -> str:
+    """Filesystem-safe shard name for a user identity (the login email)."""
+    slug = re.sub(r"[^a-z0-9]+", "_", user.lower()).strip("_")[:40]
+    digest = hashlib.sha256(user.lower().encode("utf-8")).hexdigest()[:10]
+    return f"{slug}_{digest}"
+
+
+def user_history_db(user: str = None) -> str:
+    """History database of one user; the shared legacy database when no user is given."""
+    if not user:
+        return HISTORY_DB
+    return os.path.join(os.path.dirname(HISTORY_DB), user_key(user), os.path.basename(HISTORY_DB))
+
+
+def user_saved_chat_dir(user: str = None) -> str:
+    """Saved chat folder of one user; the shared legacy folder when no user is given."""
+    if not user:
+        return SAVED_CHAT_DIR
+    return os.path.join(SAVED_CHAT_DIR, user_key(user))
+
+
+def db_files(db_path: str = HISTORY_DB) -> list:
+    """Files whose mtime/size change when the database is written (WAL mode writes the -wal file first)."""
+    return [db_path, db_path + "-wal"]
+
+
+# -------------------- 💬 CHATS --------------------
+
+def message_count(cid: str, db_path: str = HISTORY_DB) -> int:
+    """Return how many messages are stored for a chat (0 if it does not exist yet)."""
+    row = get_connection(db_path).execute(
+        "SELECT COALESCE(MAX(seq) + 1, 0) AS n FROM messages WHERE cid = ?", (cid,)
+    ).fetchone()
+    return row["n"]
+
+
+def append_messages(cid: str, title: str, timestamp: str, messages: list, db_path: str = HISTORY_DB):
+    """Append new messages to a chat, creating the chat record on first use.
+
+    Only the given messages are written, so the cost is proportional to the delta.
+    """
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")  # take the write lock before reading the sequence
+        exists = conn.execute("SELECT 1 FROM chats WHERE cid = ?", (cid,)).fetchone()
+        if exists is None:
+            conn.execute(
+                "INSERT INTO chats (cid, title, timestamp) VALUES (?, ?, ?)",
+                (cid, title or "Untitled Chat", timestamp)
+            )
+        else:
+            conn.execute("UPDATE chats SET timestamp = ? WHERE cid = ?", (timestamp, cid))
+
+        start = conn.execute(
+            "SELECT COALESCE(MAX(seq) + 1, 0) AS n FROM messages WHERE cid = ?", (cid,)
+        ).fetchone()["n"]
+        conn.executemany(
+            "INSERT INTO messages (cid, seq, role, content) VALUES (?, ?, ?, ?)",
+            [(cid, start + i, m.get("role", "unknown"), m.get("content", "")) for i, m in enumerate(messages)]
+        )
+
+
+def list_chats(db_path: str = HISTORY_DB) -> dict:
+    """Return chat metadata (title, timestamp) keyed by CID, latest first."""
+    rows = get_connection(db_path).execute(
+        "SELECT cid, title, timestamp FROM chats ORDER BY timestamp DESC"
+    ).fetchall()
+    return {
+        row["cid"]: {"title": row["title"], "timestamp": row["timestamp"]}
+        for row in rows
+    }
+
+
+def get_chat(cid: str, db_path: str = HISTORY_DB):
+    """Return a single chat with its messages, or None if the CID is unknown."""
+    conn = get_connection(db_path)
+    row = conn.execute(
+        "SELECT title, timestamp FROM chats WHERE cid = ?", (cid,)
+    ).fetchone()
+    if row is None:
+        return None
+
+    messages = conn.execute(
+        "SELECT role, content FROM messages WHERE cid = ? ORDER BY seq", (cid,)
+    ).fetchall()
+    return {
+        "title": row["title"],
+        "timestamp": row["timestamp"],
+        "chat": [{"role": m["role"], "content": m["content"]} for m in messages]
+    }
+
+
+def delete_chat(cid: str, db_path: str = HISTORY_DB) -> bool:
+    """Delete a chat by CID. Returns True if something was removed."""
+    conn = get_connection(db_path)
+    with conn:
+        cursor = conn.execute("DELETE FROM chats WHERE cid = ?", (cid,))
+    return cursor.rowcount > 0
+
+
+def clear_chats(db_path: str = HISTORY_DB):
+    """Delete every chat from the history database."""
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("DELETE FROM messages")
+        conn.execute("DELETE FROM chats")
+
+
+# -------------------- 🔎 SEARCH INDEX --------------------
+
+def ensure_search_index(conn: sqlite3.Connection):
+    """Create the search index (FTS5, or a plain table where FTS5 is missing) and index existing chats once."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chat_search'").fetchone():
+        _build_search_index(conn)
+    conn.executescript(SEARCH_TRIGGERS)
+
+
+def _build_search_index(conn: sqlite3.Connection):
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chat_search'").fetchone():
+            return  # another connection built it first
+        for statement in SEARCH_DOCS_SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        try:
+            conn.execute(SEARCH_FTS_TABLE)
+        except sqlite3.OperationalError:
+            conn.execute(SEARCH_PLAIN_TABLE)
+
+        # Backfill chats stored before the index existed
+        conn.execute("INSERT INTO search_docs (source, cid, seq) SELECT 'history', cid, -1 FROM chats")
+        conn.execute("INSERT INTO search_docs (source, cid, seq) SELECT 'history', cid, seq FROM messages")
+        conn.execute(
+            "INSERT INTO chat_search (rowid, title, content) "
+            "SELECT d.docid, c.title, '' FROM search_docs d JOIN chats c ON c.cid = d.cid WHERE d.seq = -1"
+        )
+        conn.execute(
+            "INSERT INTO chat_search (rowid, title, content) "
+            "SELECT d.docid, '', m.content FROM search_docs d JOIN messages m ON m.cid = d.cid AND m.seq = d.seq"
+        )
+
+
+def has_fts(db_path: str = HISTORY_DB) -> bool:
+    """True if the search index uses FTS5 (ranked matching), False for the LIKE fallback."""
+    row = get_connection(db_path).execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'chat_search'"
+    ).fetchone()
+    return bool(row) and "fts5" in row["sql"].lower()
+
+
+def _unindex(conn: sqlite3.Connection, source: str, cid: str = None):
+    where, params = ("source = ? AND cid = ?", (source, cid)) if cid else ("source = ?", (source,))
+    conn.execute(f"DELETE FROM chat_search WHERE rowid IN (SELECT docid FROM search_docs WHERE {where})", params)
+    conn.execute(f"DELETE FROM search_docs WHERE {where}", params)
+
+
+def index_saved_chat(cid: str, title: str, messages: list, db_path: str = HISTORY_DB):
+    """Add (or replace) a saved chat in the owner's search index."""
+    conn = get_connection(db_path)
+    with conn:
+        _unindex(conn, "saved", cid)
+        rows = [(-1, title or "Untitled", "")] + [
+            (seq, "", m.get("content", "")) for seq, m in enumerate(messages) if isinstance(m, dict)
+        ]
+        for seq, row_title, content in rows:
+            cursor = conn.execute(
+                "INSERT INTO search_docs (source, cid, seq) VALUES ('saved', ?, ?)", (cid, seq)
+            )
+            conn.execute(
+                "INSERT INTO chat_search (rowid, title, content) VALUES (?, ?, ?)",
+                (cursor.lastrowid, row_title, content)
+            )
+
+
+def unindex_saved_chat(cid: str = None, db_path: str = HISTORY_DB):
+    """Drop one saved chat, or every saved chat when no CID is given, from the search index."""
+    conn = get_connection(db_path)
+    with conn:
+        _unindex(conn, "saved", cid)
+
+
+def indexed_saved_chats(db_path: str = HISTORY_DB) -> set:
+    """CIDs of the saved chats currently in the search index."""
+    rows = get_connection(db_path).execute(
+        "SELECT cid FROM search_docs WHERE source = 'saved' AND seq = -1"
+    ).fetchall()
+    return {row["cid"] for row in rows}
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match, as a prefix."""
+    words = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_chats(text: str, db_path: str = HISTORY_DB, limit: int = 10, offset: int = 0):
+    """Find chats whose title or messages contain every word of ``text``, best match first.
+
+    Returns ``(results, has_more)`` where each result is a dict with source, cid, title
+    and a short snippet around the match.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return [], False
+    conn = get_connection(db_path)
+
+    if has_fts(db_path):
+        query = fts_query(text)
+        hits = max(SEARCH_HITS, 4 * (offset + limit + 1))
+        while True:
+            # Only the best ``hits`` messages are grouped, so common words don't group every
+            # message in the database. A chat's score is its best message, so the chats found
+            # are the true top ones; if they don't fill the page and the cap cut hits off, widen it.
+            rows = conn.execute(
+                "SELECT d.source, d.cid, MIN(hits.score) AS score, SUM(COUNT(*)) OVER () AS hit_count FROM ("
+                "    SELECT rowid, bm25(chat_search, 3.0, 1.0) AS score FROM chat_search WHERE chat_search MATCH ?"
+                "    ORDER BY score LIMIT ?"
+                ") AS hits JOIN search_docs d ON d.docid = hits.rowid "
+                "GROUP BY d.source, d.cid ORDER BY score LIMIT ?",
+                (query, hits, offset + limit + 1)
+            ).fetchall()
+            if len(rows) > offset + limit or not rows or rows[0]["hit_count"] < hits:
+                break
+            hits *= 4
+        rows = rows[offset:]
+    else:
+        condition = " AND ".join(["(s.title LIKE ? OR s.content LIKE ?)"] * len(words))
+        params = [f"%{word}%" for word in words for _ in range(2)]
+        rows = conn.execute(
+            "SELECT d.source, d.cid, -COUNT(*) AS score "
+            f"FROM chat_search s JOIN search_docs d ON d.docid = s.rowid WHERE {condition} "
+            "GROUP BY d.source, d.cid ORDER BY score, MAX(d.docid) DESC LIMIT ? OFFSET ?",
+            params + [limit + 1, offset]
+        ).fetchall()
+
+    results = []
+    for row in rows[:limit]:
+        title_row = conn.execute(
+            "SELECT s.title FROM search_docs d JOIN chat_search s ON s.rowid = d.docid "
+            "WHERE d.source = ? AND d.cid = ? AND d.seq = -1",
+            (row["source"], row["cid"])
+        ).fetchone()
+        results.append({
+            "source": row["source"],
+            "cid": row["cid"],
+            "title": title_row["title"] if title_row else "Untitled",
+            "snippet": _snippet(conn, row["source"], row["cid"], words),
+            "score": row["score"]
+        })
+    return results, len(rows) > limit
+
+
+def _snippet(conn: sqlite3.Connection, source: str, cid: str, words: list, width: int = 60) -> str:
+    """Text around the first matching message of a chat, with the match in bold."""
+    condition = " OR ".join(["s.content LIKE ?"] * len(words))
+    row = conn.execute(
+        "SELECT s.content FROM search_docs d JOIN chat_search s ON s.rowid = d.docid "
+        f"WHERE d.source = ? AND d.cid = ? AND d.seq >= 0 AND ({condition}) ORDER BY d.seq LIMIT 1",
+        [source, cid] + [f"%{word}%" for word in words]
+    ).fetchone()
+    if row is None:
+        return ""
+
+    content = " ".join(row["content"].replace("<think>", " ").replace("</think>", " ").split())
+    lowered = content.lower()
+    position = min((lowered.find(word) for word in words if word in lowered), default=0)
+    start = max(0, position - width // 2)
+    excerpt = content[start:start + width]
+    return ("…" if start else "") + excerpt + ("…" if start + width < len(content) else "")
+
+
+# -------------------- 💾 SAVED CHAT MANIFEST --------------------
+
+def manifest_path(saved_dir: str) -> str:
+    """Path of the metadata index kept next to the saved chat files."""
+    return os.path.join(saved_dir, MANIFEST_NAME)
+
+
+def write_manifest(saved_dir: str, entries: dict):
+    """Write the manifest: {cid: {"title", "timestamp", "file"}} with file names relative to saved_dir."""
+    with locked(manifest_path(saved_dir)):
+        atomic_write_json(manifest_path(saved_dir), entries, ensure_ascii=False)
+
+
+def rebuild_manifest(saved_dir: str) -> dict:
+    """Scan every saved chat file once to recreate a missing or unreadable manifest."""
+    with locked(manifest_path(saved_dir)):
+        return _rebuild_manifest(saved_dir)
+
+
+def _rebuild_manifest(saved_dir: str) -> dict:
+    entries = {}
+    for filename in os.listdir(saved_dir):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(saved_dir, filename), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue  # Skip unreadable files rather than losing the whole index
+
+        cid = data.get("cid") or filename.replace(".json", "")
+        entries[cid] = {
+            "title": data.get("title", "Untitled"),
+            "timestamp": data.get("timestamp", ""),
+            "file": filename
+        }
+
+    write_manifest(saved_dir, entries)
+    return entries
+
+
+def read_manifest(saved_dir: str) -> dict:
+    """Return the saved chat metadata index, rebuilding it from the files if needed."""
+    try:
+        with open(manifest_path(saved_dir), "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        if isinstance(entries, dict):
+            return entries
+    except (OSError, ValueError):
+        pass
+    return rebuild_manifest(saved_dir)
+
+
+def add_to_manifest(saved_dir: str, cid: str, title: str, timestamp: str, filename: str):
+    """Record a newly saved chat in the manifest."""
+    with locked(manifest_path(saved_dir)):
+        entries = read_manifest(saved_dir)
+        entries[cid] = {"title": title, "timestamp": timestamp, "file": filename}
+        write_manifest(saved_dir, entries)
+
+
+def remove_from_manifest(saved_dir: str, cid: str):
+    """Drop a deleted chat from the manifest."""
+    with locked(manifest_path(saved_dir)):
+        entries = read_manifest(saved_dir)
+        if entries.pop(cid, None) is not None:
+            write_manifest(saved_dir, entries)
+
+
+# -------------------- 🚚 MIGRATION --------------------
+
+def migrate_history_json(json_path: str = LEGACY_HISTORY_FILE, db_path: str = HISTORY_DB) -> int:
+    """Import a legacy history.json into the database and rename it to *.migrated.
+
+    Returns the number of chats imported. Entries whose CID already exists are skipped,
+    so running the migrator twice is harmless.
+    """
+    with locked(json_path):
+        return _migrate_history_json(json_path, db_path)
+
+
+def _migrate_history_json(json_path: str, db_path: str) -> int:
+    if not os.path.exists(json_path):
+        return 0
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            data = {}
+
+    # Not get_connection(): on a first open it would start this same migration again
+    conn = open_database(db_path, SCHEMA, ensure_search_index)
+    imported = 0
+    with conn:
+        for cid, entry in (data.items() if isinstance(data, dict) else []):
+            if not isinstance(entry, dict):
+                continue
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO chats (cid, title, hash, timestamp) VALUES (?, ?, ?, ?)",
+                (cid, entry.get("title", "Untitled"), entry.get("hash"), entry.get("timestamp", ""))
+            )
+            if cursor.rowcount == 0:
+                continue
+            conn.executemany(
+                "INSERT INTO messages (cid, seq, role, content) VALUES (?, ?, ?, ?)",
+                [
+                    (cid, seq, m.get("role", "unknown"), m.get("content", ""))
+                    for seq, m in enumerate(entry.get("chat", []))
+                    if isinstance(m, dict)
+                ]
+            )
+            imported += 1
+
+    os.replace(json_path, json_path + ".migrated")
+    return imported
+
+
+def assign_legacy_data(user: str) -> tuple:
+    """Move chats stored before per-user shards (shared history and root saved chats) to ``user``.
+
+    The app always has a logged-in user on the chat page, so the shared legacy locations
+    are otherwise unreachable. Returns ``(history chats moved, saved chats moved)``;
+    chats whose CID the user already has are left where they are.
+    """
+    legacy = get_connection(HISTORY_DB)  # also imports a leftover legacy history.json
+    target_db = user_history_db(user)
+    conn = get_connection(target_db)
+
+    with locked(HISTORY_DB):
+        conn.execute("ATTACH DATABASE ? AS legacy", (os.path.abspath(HISTORY_DB),))
+        try:
+            with conn:
+                moved = conn.execute(
+                    "SELECT cid FROM legacy.chats WHERE cid NOT IN (SELECT cid FROM main.chats)"
+                ).fetchall()
+                conn.execute(
+                    "INSERT INTO main.chats (cid, title, hash, timestamp) "
+                    "SELECT cid, title, hash, timestamp FROM legacy.chats WHERE cid NOT IN (SELECT cid FROM main.chats)"
+                )
+                conn.execute(
+                    "INSERT INTO main.messages (cid, seq, role, content) "
+                    "SELECT m.cid, m.seq, m.role, m.content FROM legacy.messages m "
+                    "WHERE NOT EXISTS (SELECT 1 FROM main.messages x WHERE x.cid = m.cid)"
+                )
+        finally:
+            conn.execute("DETACH DATABASE legacy")
+        with legacy:
+            legacy.executemany("DELETE FROM chats WHERE cid = ?", [(row["cid"],) for row in moved])
+
+    saved_moved = 0
+    target_dir = user_saved_chat_dir(user)
+    if os.path.isdir(SAVED_CHAT_DIR):
+        os.makedirs(target_dir, exist_ok=True)
+        with locked(manifest_path(SAVED_CHAT_DIR)), locked(manifest_path(target_dir)):
+            for filename in os.listdir(SAVED_CHAT_DIR):
+                source = os.path.join(SAVED_CHAT_DIR, filename)
+                destination = os.path.join(target_dir, filename)
+                if filename.endswith(".json") and os.path.isfile(source) and not os.path.exists(destination):
+                    os.replace(source, destination)
+                    saved_moved += 1
+            if saved_moved:
+                _rebuild_manifest(SAVED_CHAT_DIR)
+                _rebuild_manifest(target_dir)
+    return len(moved), saved_moved
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chat storage maintenance.")
+    parser.add_argument("--assign", metavar="EMAIL", help="move chats saved before per-user storage to this user")
+    args = parser.parse_args()
+
+    count = migrate_history_json()
+    print(f"Migrated {count} chat(s) from {LEGACY_HISTORY_FILE} to {HISTORY_DB}")
+    if args.assign:
+        history_count, saved_count = assign_legacy_data(args.assign)
+        print(f"Moved {history_count} history chat(s) and {saved_count} saved chat(s) to {args.assign}")
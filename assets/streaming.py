@@ -0,0 +1,101 @@
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class ThinkFilter:
+    """Incrementally remove <think>…</think> sections from a token stream.
+
+    Tags may be split across chunks, so any trailing text that could be the start
+    of a tag is held back until the next chunk decides it.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._inside = False
+        self._started = False  # leading whitespace is dropped until visible text appears
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the text that is safe to show now."""
+        self._buffer += chunk or ""
+        visible = []
+
+        while self._buffer:
+            if self._inside:
+                end = self._buffer.find(THINK_CLOSE)
+                if end == -1:
+                    # Discard reasoning text, but keep a possible partial closing tag
+                    self._buffer = self._buffer[-(len(THINK_CLOSE) - 1):]
+                    break
+                self._buffer = self._buffer[end + len(THINK_CLOSE):]
+                self._inside = False
+                continue
+
+            start = self._buffer.find(THINK_OPEN)
+            stray = self._buffer.find(THINK_CLOSE)
+            if stray != -1 and (start == -1 or stray < start):
+                # Closing tag without an opening one: drop just the tag
+                visible.append(self._buffer[:stray])
+                self._buffer = self._buffer[stray + len(THINK_CLOSE):]
+                continue
+            if start != -1:
+                visible.append(self._buffer[:start])
+                self._buffer = self._buffer[start + len(THINK_OPEN):]
+                self._inside = True
+                continue
+
+            hold = _partial_tag_length(self._buffer)
+            visible.append(self._buffer[:len(self._buffer) - hold])
+            self._buffer = self._buffer[len(self._buffer) - hold:]
+            break
+
+        return self._emit("".join(visible))
+
+    def flush(self) -> str:
+        """Return any held-back text once the stream has ended."""
+        tail = "" if self._inside else self._buffer
+        self._buffer = ""
+        return self._emit(tail)
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
+
+def _partial_tag_length(text: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of a think tag."""
+    for size in range(min(len(text), len(THINK_CLOSE) - 1), 0, -1):
+        suffix = text[-size:]
+        if THINK_OPEN.startswith(suffix) or THINK_CLOSE.startswith(suffix):
+            return size
+    return 0
+
+
+def strip_think(text: str) -> str:
+    """Remove <think>…</think> sections from a complete response."""
+    think_filter = ThinkFilter()
+    return (think_filter.feed(text) + think_filter.flush()).strip()
+
+
+def stream_visible_text(chat_model, messages):
+    """Yield the visible part of a model response chunk by chunk.
+
+    Uses the LangChain ``.stream()`` interface when the model has one and falls back
+    to a single blocking ``.invoke()`` otherwise.
+    """
+    think_filter = ThinkFilter()
+
+    if hasattr(chat_model, "stream"):
+        chunks = (chunk.content for chunk in chat_model.stream(messages))
+    else:
+        chunks = iter([chat_model.invoke(messages).content])
+
+    for content in chunks:
+        visible = think_filter.feed(content if isinstance(content, str) else "")
+        if visible:
+            yield visible
+
+    tail = think_filter.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,112 @@
+import logging
+import sqlite3
+import csv
+import os
+from .storage import open_database
+
+# Constants
+USER_DB = "user/users.db"
+LEGACY_USER_FILE = "user/users.csv"
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT NOT NULL UNIQUE,
+    email    TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# Databases already checked for the one-shot CSV import in this process
+_migrated = set()
+
+
+def get_connection(db_path: str = USER_DB) -> sqlite3.Connection:
+    """Return this thread's connection to the user store, importing users.csv on first use."""
+    conn = open_database(db_path, SCHEMA)
+    if db_path not in _migrated:
+        migrate_users_csv(LEGACY_USER_FILE, db_path)
+        _migrated.add(db_path)
+    return conn
+
+
+def migrate_users_csv(csv_path: str = LEGACY_USER_FILE, db_path: str = USER_DB) -> int:
+    """Import accounts from the old users.csv once. Returns the number of users imported.
+
+    The CSV is left in place; a marker in the meta table stops it being read again.
+    Rows whose username or email is already taken are skipped and logged with the
+    account that kept it, so the duplicates can be sorted out by hand.
+    """
+    conn = open_database(db_path, SCHEMA)
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone():
+        return 0
+
+    imported = 0
+    with conn:
+        if os.path.isfile(csv_path):
+            with open(csv_path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    username = (row.get("username") or "").strip()
+                    email = (row.get("email") or "").strip()
+                    if not username or not email:
+                        continue
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO users (username, email, password) VALUES (?, ?, ?)",
+                        (username, email, row.get("password") or "")
+                    )
+                    if cursor.rowcount:
+                        imported += 1
+                        continue
+                    kept = conn.execute(
+                        "SELECT username, email FROM users WHERE email = ? OR username = ? LIMIT 1",
+                        (email, username)
+                    ).fetchone()
+                    logger.warning(
+                        "users.csv: skipped account %r <%s>, it conflicts with existing account %r <%s>",
+                        username, email, kept["username"], kept["email"]
+                    )
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_migrated', '1')")
+    return imported
+
+
+def find_user(login: str, db_path: str = USER_DB):
+    """Look up a user by email or username via the unique indexes. Returns a dict or None."""
+    row = get_connection(db_path).execute(
+        "SELECT username, email, password FROM users WHERE email = ? "
+        "UNION ALL "
+        "SELECT username, email, password FROM users WHERE username = ? "
+        "LIMIT 1",
+        (login, login)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def username_exists(username: str, db_path: str = USER_DB) -> bool:
+    """Return True if the username is already taken."""
+    return get_connection(db_path).execute(
+        "SELECT 1 FROM users WHERE username = ?", (username,)
+    ).fetchone() is not None
+
+
+def create_user(username: str, email: str, password: str, db_path: str = USER_DB):
+    """Insert a new account atomically.
+
+    Returns None on success, or "username" / "email" naming the field that is already taken.
+    The unique indexes make concurrent sign-ups with the same name safe.
+    """
+    conn = get_connection(db_path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+                (username, email, password)  # Add hashing for production!
+            )
+        return None
+    except sqlite3.IntegrityError as e:
+        return "email" if "users.email" in str(e) else "username"
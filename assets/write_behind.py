@@ -0,0 +1,212 @@
+from .config import env_flag, env_float, env_int
+from . import storage
+from . import cache
+from . import metrics
+import threading
+import logging
+import atexit
+import queue
+import time
+
+# Defaults, overridable from .env
+DEFAULT_FLUSH_INTERVAL = 0.5   # HISTORY_FLUSH_INTERVAL: seconds between background flushes
+DEFAULT_QUEUE_SIZE = 1000      # HISTORY_QUEUE_SIZE: pending turns before submitters wait (backpressure)
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """Background writer that takes chat turns off the request path and saves them in batches.
+
+    Turns for the same chat that arrive within one flush interval are merged into a
+    single append. ``flush(db_path)`` blocks until everything submitted so far for that
+    database is on disk (or has failed); other databases' pending writes are not waited on.
+    """
+
+    def __init__(self, flush_interval: float = DEFAULT_FLUSH_INTERVAL, max_queue: int = DEFAULT_QUEUE_SIZE):
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._failed = set()  # (db_path, cid) whose last append failed; see take_failure()
+
+        # Every submit gets the next sequence number; flush() waits for its own database's last one
+        self._progress = threading.Condition()
+        self._seq = 0
+        self._unwritten = {}  # db_path -> sequence numbers queued but not yet written (or failed)
+
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "flushes": 0,
+            "records_written": 0,
+            "records_failed": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    # -------------------- producer side --------------------
+
+    def submit(self, db_path: str, cid: str, title: str, timestamp: str, messages: list):
+        """Queue new messages for a chat. Blocks only when the queue is full."""
+        if not messages:
+            return
+        self._ensure_started()
+        with self._progress:
+            self._seq += 1
+            seq = self._seq
+            self._unwritten.setdefault(db_path, set()).add(seq)
+        self._queue.put({
+            "db_path": db_path, "cid": cid, "title": title,
+            "timestamp": timestamp, "messages": messages, "seq": seq
+        })
+
+    def flush(self, db_path: str = None):
+        """Wait until everything submitted so far for ``db_path`` (every database if None) is written."""
+        if self._thread is None:
+            return
+        with self._progress:
+            target = self._seq  # turns submitted after this point are not waited for
+            while self._oldest_unwritten(db_path) <= target:
+                self._wake.set()  # on every cycle, so later batches don't sit out the flush interval
+                self._progress.wait(self.flush_interval)
+
+    def pending(self, db_path: str = None) -> bool:
+        """True while submitted turns (for ``db_path``, or any database) are not yet written."""
+        with self._progress:
+            return bool(self._unwritten) if db_path is None else db_path in self._unwritten
+
+    def stop(self):
+        """Flush and stop the worker (called at interpreter shutdown)."""
+        if self._thread is None:
+            return
+        self.flush()
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def take_failure(self, db_path: str, cid: str) -> bool:
+        """True (once) if a queued append for this chat failed, so its caller's saved count is wrong."""
+        with self._metrics_lock:
+            if (db_path, cid) in self._failed:
+                self._failed.discard((db_path, cid))
+                return True
+            return False
+
+    def metrics(self) -> dict:
+        """Queue depth and flush latency figures for monitoring."""
+        with self._metrics_lock:
+            snapshot = dict(self._metrics)
+        snapshot["queue_depth"] = self._queue.qsize()
+        snapshot["avg_flush_ms"] = snapshot["total_flush_ms"] / snapshot["flushes"] if snapshot["flushes"] else 0.0
+        return snapshot
+
+    # -------------------- worker side --------------------
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="nexa-history-writer", daemon=True)
+                self._thread.start()
+
+    def _oldest_unwritten(self, db_path: str = None) -> float:
+        """Lowest unwritten sequence number for ``db_path`` (any database if None); inf if none."""
+        groups = self._unwritten.values() if db_path is None else [self._unwritten.get(db_path, ())]
+        return min((min(seqs) for seqs in groups if seqs), default=float("inf"))
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+            batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_batch(batch)
+            if self._stopping and self._queue.empty():
+                return
+
+    def _write_batch(self, batch: list):
+        started = time.perf_counter()
+
+        # Coalesce: one append per chat, keeping message order within each chat
+        merged = {}
+        for record in batch:
+            key = (record["db_path"], record["cid"])
+            if key in merged:
+                merged[key]["messages"].extend(record["messages"])
+                merged[key]["timestamp"] = record["timestamp"]
+            else:
+                merged[key] = dict(record, messages=list(record["messages"]))
+
+        written = failed = 0
+        for (db_path, cid), record in merged.items():
+            try:
+                storage.append_messages(cid, record["title"], record["timestamp"], record["messages"], db_path)
+                cache.invalidate(f"history:{db_path}")
+                written += 1
+                with self._metrics_lock:
+                    self._failed.discard((db_path, cid))
+            except Exception:
+                failed += 1
+                logger.exception("Failed to save chat %s to %s", cid, db_path)
+                with self._metrics_lock:
+                    self._failed.add((db_path, cid))
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._metrics_lock:
+            self._metrics["flushes"] += 1
+            self._metrics["records_written"] += written
+            self._metrics["records_failed"] += failed
+            self._metrics["last_flush_ms"] = elapsed_ms
+            self._metrics["max_flush_ms"] = max(self._metrics["max_flush_ms"], elapsed_ms)
+            self._metrics["total_flush_ms"] += elapsed_ms
+
+        with self._progress:
+            for record in batch:
+                seqs = self._unwritten[record["db_path"]]
+                seqs.discard(record["seq"])
+                if not seqs:
+                    del self._unwritten[record["db_path"]]
+            self._progress.notify_all()
+
+
+# -------------------- ⚙️ SHARED INSTANCE --------------------
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_history_writer():
+    """Return the process-wide writer, or None when HISTORY_WRITE_BEHIND=0 (synchronous saves)."""
+    global _writer
+    if not env_flag("HISTORY_WRITE_BEHIND", True):
+        return None
+
+    with _writer_lock:
+        if _writer is None:
+            _writer = HistoryWriter(
+                flush_interval=env_float("HISTORY_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL),
+                max_queue=env_int("HISTORY_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)
+            )
+            atexit.register(_writer.stop)
+            metrics.register_gauges("nexa_history_writer", _writer.metrics)
+        return _writer
+
+
+def flush_history_writes(db_path: str = None):
+    """Make sure queued turns for ``db_path`` (all if None) are on disk, before reads that must see them."""
+    if _writer is not None and _writer.pending(db_path):
+        _writer.flush(db_path)
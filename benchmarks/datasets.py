@@ -0,0 +1,95 @@
+"""Synthetic, reproducible data for the benchmark suite.
+
+A dataset of size N is a working directory laid out like the app's own files:
+N history chats in one user's shard, N saved chat files with their manifest, and
+N accounts in the user store. Datasets are built once and reused across runs.
+"""
+import datetime
+import random
+import json
+import os
+
+BENCH_USER = "bench0@example.com"
+BENCH_PASSWORD = "bench-password"
+MESSAGES_PER_CHAT = 6
+
+WORDS = (
+    "python streamlit model prompt token answer question chat history saved search index "
+    "cache latency server user login shayari joke quote motivation code error fix deploy "
+    "database query memory thread queue stream response context window budget summary"
+).split()
+
+
+def sentence(rng: random.Random, words: int = 14) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_chat(rng: random.Random, index: int) -> list:
+    """One conversation: alternating user/ai messages of plausible length."""
+    chat = []
+    for turn in range(MESSAGES_PER_CHAT // 2):
+        chat.append({"role": "user", "content": f"Question {index}.{turn}: {sentence(rng, 10)}"})
+        chat.append({"role": "ai", "content": " ".join(sentence(rng) for _ in range(4))})
+    return chat
+
+
+def build_dataset(root: str, size: int, seed: int = 42) -> str:
+    """Create (or reuse) the dataset for ``size`` chats under ``root``; returns its directory."""
+    directory = os.path.abspath(os.path.join(root, f"chats_{size}"))
+    marker = os.path.join(directory, ".complete")
+    if os.path.exists(marker):
+        return directory
+
+    os.makedirs(directory, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(directory)  # the app's storage paths are relative to the working directory
+    try:
+        _populate(size, random.Random(seed))
+    finally:
+        os.chdir(cwd)
+
+    with open(marker, "w") as f:
+        f.write(str(size))
+    return directory
+
+
+def _populate(size: int, rng: random.Random):
+    from assets import storage, users
+
+    start = datetime.datetime(2024, 1, 1)
+    db_path = storage.user_history_db(BENCH_USER)
+    saved_dir = storage.user_saved_chat_dir(BENCH_USER)
+    os.makedirs(saved_dir, exist_ok=True)
+
+    conn = storage.get_connection(db_path)
+    manifest = {}
+    batch_chats, batch_messages = [], []
+    for index in range(size):
+        cid = f"cid_bench_{index:06d}"
+        timestamp = (start + datetime.timedelta(minutes=index)).strftime("%Y-%m-%d %H:%M:%S")
+        chat = make_chat(rng, index)
+        title = chat[0]["content"][:45]
+
+        batch_chats.append((cid, title, timestamp))
+        batch_messages.extend((cid, seq, m["role"], m["content"]) for seq, m in enumerate(chat))
+
+        saved_cid = f"cid_saved_{index:06d}"
+        filename = f"{saved_cid}.json"
+        with open(os.path.join(saved_dir, filename), "w", encoding="utf-8") as f:
+            json.dump({"cid": saved_cid, "title": title, "timestamp": timestamp, "chat": chat}, f, indent=2)
+        manifest[saved_cid] = {"title": title, "timestamp": timestamp, "file": filename}
+
+        if len(batch_chats) >= 5000 or index == size - 1:
+            with conn:
+                conn.executemany("INSERT INTO chats (cid, title, timestamp) VALUES (?, ?, ?)", batch_chats)
+                conn.executemany("INSERT INTO messages (cid, seq, role, content) VALUES (?, ?, ?, ?)", batch_messages)
+            batch_chats, batch_messages = [], []
+
+    storage.write_manifest(saved_dir, manifest)
+
+    user_conn = users.get_connection()
+    with user_conn:
+        user_conn.executemany(
+            "INSERT OR IGNORE INTO users (username, email, password) VALUES (?, ?, ?)",
+            [(f"bench{i}", f"bench{i}@example.com", BENCH_PASSWORD) for i in range(max(size, 1))]
+        )
@@ -0,0 +1,169 @@
+"""Local stand-in for the Groq chat completions API, for load tests without network access.
+
+Run it on its own:
+
+    python -m benchmarks.fake_groq --port 8765 --latency 0.2 --error-rate 0.1
+
+and point the app at it with GROQ_BASE_URL=http://127.0.0.1:8765 (any API_KEY works).
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import argparse
+import random
+import json
+import time
+import uuid
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+
+class FakeGroqServer:
+    """OpenAI-compatible /chat/completions endpoint with configurable latency and failures.
+
+    ``latency`` is the time to first token, ``token_delay`` the gap between streamed
+    tokens, and ``error_rate`` the share of requests answered with ``error_status``
+    (429 by default) so retry behaviour can be exercised.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.05, token_delay: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 429, reply: str = None):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reply = reply
+        self.requests = 0
+        self.errors = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-groq", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def answer_for(self, messages: list) -> str:
+        """Deterministic reply: echoes the last user message behind a short reasoning block."""
+        if self.reply is not None:
+            return self.reply
+        prompt = messages[-1].get("content", "") if messages else ""
+        return f"<think>Considering: {prompt[:40]}</think>\n\nFake answer to: {prompt}"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if self.path.rstrip("/") != COMPLETIONS_PATH:
+                    return self._send_json(404, {"error": {"message": "not found"}})
+
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                    server._in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server._in_flight)
+                    failing = random.random() < server.error_rate
+                    if failing:
+                        server.errors += 1
+                try:
+                    time.sleep(server.latency)
+                    if failing:
+                        return self._send_json(server.error_status, {"error": {"message": "fake failure", "type": "rate_limit"}})
+                    answer = server.answer_for(body.get("messages", []))
+                    if body.get("stream"):
+                        self._stream(body.get("model", "fake"), answer)
+                    else:
+                        self._send_json(200, _completion(body.get("model", "fake"), answer))
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+
+            def _send_json(self, status: int, payload: dict):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, model: str, answer: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                tokens = [answer[i:i + 4] for i in range(0, len(answer), 4)]
+                for index, token in enumerate(tokens + [None]):
+                    delta = {"content": token} if token is not None else {}
+                    if index == 0:
+                        delta["role"] = "assistant"
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": None if token is not None else "stop"}]
+                    }
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+                    if token is not None and server.token_delay:
+                        time.sleep(server.token_delay)
+                self._write_chunk("data: [DONE]\n\n")
+                self._write_chunk("")
+
+            def _write_chunk(self, text: str):
+                data = text.encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def _completion(model: str, answer: str) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": len(answer) // 4, "total_tokens": 10 + len(answer) // 4}
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    args = parser.parse_args()
+
+    fake = FakeGroqServer(args.host, args.port, args.latency, args.token_delay, args.error_rate, args.error_status)
+    print(f"Fake Groq listening on {fake.base_url} (GROQ_BASE_URL={fake.base_url})")
+    try:
+        fake._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
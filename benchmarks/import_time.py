@@ -0,0 +1,83 @@
+"""Import-time report for the app's entry points, from ``python -X importtime``.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --top 15 --runs 5 assets.bot langchain_groq
+
+Each target is imported in a fresh interpreter so results are cold-start figures
+(the OS file cache is warm after the first run; the median over runs is reported).
+"""
+import subprocess
+import statistics
+import argparse
+import sys
+import os
+
+# What the Login page imports vs. what only the chat page needs
+DEFAULT_TARGETS = {
+    "login page (main.py top level)": ["streamlit", "assets.auth", "assets.sidebar", "dotenv"],
+    "chat page (assets.bot)": ["assets.bot"],
+    "chat model (dispatcher + ChatGroq)": ["assets.dispatcher", "langchain_groq", "httpx"],
+}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(modules: list) -> list:
+    """Import ``modules`` in a new interpreter; return [(module, self_us, cumulative_us, depth)]."""
+    code = "; ".join(f"import {name}" for name in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=ROOT)
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def total_ms(rows: list) -> float:
+    """Wall time of the import: the sum of the top-level cumulative figures."""
+    return sum(cumulative for _, _, cumulative, depth in rows if depth == 0) / 1000
+
+
+def summarize(label: str, modules: list, runs: int, top: int):
+    totals = []
+    rows = []
+    for _ in range(runs):
+        rows = import_profile(modules)
+        totals.append(total_ms(rows))
+
+    print(f"\n== {label}: {', '.join(modules)}")
+    print(f"   total {statistics.median(totals):8.1f} ms (median of {runs}, min {min(totals):.1f}, max {max(totals):.1f})")
+
+    # Heaviest packages by cumulative time, counting each top-level package once
+    packages = {}
+    for name, _, cumulative, _ in rows:
+        root = name.split(".")[0]
+        packages[root] = max(packages.get(root, 0), cumulative)
+    print(f"   {'package':<32}{'cumulative ms':>14}")
+    for name, cumulative in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"   {name:<32}{cumulative / 1000:>14.1f}")
+    return statistics.median(totals)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", help="modules to profile instead of the default entry points")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    targets = {"custom": args.modules} if args.modules else DEFAULT_TARGETS
+    for label, modules in targets.items():
+        try:
+            summarize(label, modules, args.runs, args.top)
+        except RuntimeError as e:
+            print(f"\n== {label}: skipped ({e})")
@@ -0,0 +1,89 @@
+"""Load-test the LLM dispatcher against the local fake Groq endpoint.
+
+    python -m benchmarks.load_dispatcher --users 20 --requests 5 --error-rate 0.1
+
+Reports latency percentiles, retries and the peak upstream concurrency the fake saw,
+which must never exceed LLM_MAX_CONCURRENCY.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import HumanMessage
+from assets.dispatcher import LLMDispatcher, create_chat_model, DispatcherBusy
+from benchmarks.fake_groq import FakeGroqServer
+import statistics
+import argparse
+import time
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(users: int, requests: int, max_concurrency: int, per_user: int, latency: float,
+        token_delay: float, error_rate: float, stream: bool) -> dict:
+    with FakeGroqServer(latency=latency, token_delay=token_delay, error_rate=error_rate) as fake:
+        dispatcher = LLMDispatcher(
+            create_chat_model("fake-key", base_url=fake.base_url),
+            max_concurrency=max_concurrency, max_queue=users * requests, per_user=per_user, timeout=60
+        )
+
+        def session(user_index: int) -> list:
+            model = dispatcher.for_user(f"user{user_index}@example.com")
+            timings = []
+            for n in range(requests):
+                messages = [HumanMessage(content=f"question {n} from user {user_index}")]
+                started = time.perf_counter()
+                try:
+                    if stream:
+                        first = None
+                        for _ in model.stream(messages):
+                            first = first or time.perf_counter()
+                    else:
+                        model.invoke(messages)
+                    timings.append(time.perf_counter() - started)
+                except DispatcherBusy:
+                    pass
+                except Exception as e:
+                    print(f"user{user_index}: {type(e).__name__}: {e}")
+            return timings
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as clients:
+            latencies = [t for result in clients.map(session, range(users)) for t in result]
+        elapsed = time.perf_counter() - started
+        dispatcher.shutdown()
+
+        return {
+            "calls": len(latencies),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+            "upstream_requests": fake.requests,
+            "upstream_errors": fake.errors,
+            "upstream_peak_concurrency": fake.max_in_flight,
+            "dispatcher": dispatcher.metrics(),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--per-user", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--invoke", action="store_true", help="use blocking invoke instead of streaming")
+    args = parser.parse_args()
+
+    report = run(args.users, args.requests, args.max_concurrency, args.per_user, args.latency,
+                 args.token_delay, args.error_rate, stream=not args.invoke)
+    for key, value in report.items():
+        print(f"{key:>26}: {value}")
@@ -0,0 +1,273 @@
+"""End-to-end benchmark suite: the app's real functions on synthetic datasets.
+
+    python -m benchmarks.run                                  # 10, 1k and 100k chats
+    python -m benchmarks.run --sizes 10 1000 --save-baseline  # record benchmarks/baseline.json
+    python -m benchmarks.run --sizes 10 1000                  # compare against it
+
+Each dataset size runs in its own interpreter (the app's paths and caches are per
+process). Full reruns drive main.py through Streamlit's AppTest harness, with the
+chat model pointed at the deterministic local fake Groq endpoint. Timings are
+reported as percentiles in milliseconds; with a baseline present, any benchmark
+whose p50 or p95 grew by more than --tolerance is flagged and the exit code is 1.
+"""
+import subprocess
+import argparse
+import random
+import json
+import time
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SIZES = [10, 1000, 100000]
+DEFAULT_WORKDIR = os.path.join(ROOT, "benchmarks", ".data")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+RESULT_MARKER = "@@BENCH_RESULTS@@"
+
+PROMPTS = [
+    "Tell me a shayari about rain", "give me a gujarati joke", "motivational quote please",
+    "What is a Python decorator?", "chanakya niti", "how do I deploy streamlit",
+    "Explain SQLite WAL mode in simple words and when it helps", "hello", "who made you",
+]
+
+
+# -------------------- 📏 MEASUREMENT --------------------
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(timings: list) -> dict:
+    return {
+        "n": len(timings),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3) if timings else 0.0,
+    }
+
+
+def timed(call, repeat: int, before=None) -> list:
+    """Run ``call(i)`` ``repeat`` times and return the durations; ``before(i)`` runs untimed."""
+    timings = []
+    for i in range(repeat):
+        if before:
+            before(i)
+        started = time.perf_counter()
+        call(i)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+# -------------------- 🧪 BENCHMARKS (worker process) --------------------
+
+def run_worker(size: int, workdir: str, iterations: int, rerun_iterations: int) -> dict:
+    sys.path.insert(0, ROOT)
+    from benchmarks.datasets import build_dataset, BENCH_USER, BENCH_PASSWORD
+
+    started = time.perf_counter()
+    directory = build_dataset(workdir, size)
+    build_s = time.perf_counter() - started
+    os.chdir(directory)
+
+    import streamlit as st
+    from assets import bot, cache, storage, users
+    from assets.matcher import find_custom_response
+    from assets.chat_records import ChatRecord
+    from assets.write_behind import flush_history_writes
+
+    rng = random.Random(7)
+    st.session_state.logged_in_user = BENCH_USER
+    db_path = storage.user_history_db(BENCH_USER)
+    saved_dir = storage.user_saved_chat_dir(BENCH_USER)
+    results = {}
+
+    # CUSTOM_RESPONSES lookup
+    results["custom_response_lookup"] = timed(lambda i: find_custom_response(PROMPTS[i % len(PROMPTS)]), iterations * 10)
+
+    # Login / signup lookups against the user store
+    population = max(size, 1)
+    results["login_lookup_email"] = timed(
+        lambda i: users.find_user(f"bench{rng.randrange(population)}@example.com"), iterations
+    )
+    results["login_lookup_username"] = timed(lambda i: users.find_user(f"bench{rng.randrange(population)}"), iterations)
+    signup_names = [f"signup_{os.getpid()}_{i}" for i in range(iterations)]
+    results["signup"] = timed(
+        lambda i: users.username_exists(signup_names[i])
+        or users.create_user(signup_names[i], f"{signup_names[i]}@example.com", BENCH_PASSWORD),
+        iterations
+    )
+    with users.get_connection() as conn:
+        conn.execute("DELETE FROM users WHERE username LIKE 'signup_%'")
+
+    # History listing: cold (cache dropped before each call) and warm
+    results["load_chat_history_cold"] = timed(
+        lambda i: bot.load_chat_history(), iterations, before=lambda i: cache.invalidate(f"history:{db_path}")
+    )
+    results["load_chat_history_warm"] = timed(lambda i: bot.load_chat_history(), iterations)
+
+    # Saved chats: manifest listing and opening one transcript
+    results["load_saved_chats_cold"] = timed(
+        lambda i: bot.load_saved_chats(), iterations, before=lambda i: cache.invalidate(f"saved_chats:{saved_dir}")
+    )
+    results["load_saved_chats_warm"] = timed(lambda i: bot.load_saved_chats(), iterations)
+    saved_cids = list(bot.load_saved_chats())
+    results["open_saved_chat"] = timed(lambda i: bot.open_saved_chat(rng.choice(saved_cids)), iterations)
+
+    # save_to_history: a 10-turn conversation saved after every turn, as the chat page does
+    turns = []
+    for chat_number in range(max(1, iterations // 10)):
+        cid = f"cid_bench_save_{chat_number}"
+        history = []
+        for turn in range(10):
+            history.append(ChatRecord("user", f"benchmark question {chat_number}.{turn}"))
+            history.append(ChatRecord("ai", f"benchmark answer {chat_number}.{turn} " * 20))
+            started = time.perf_counter()
+            bot.save_to_history(history, cid)
+            turns.append(time.perf_counter() - started)
+        flush_history_writes(db_path)
+        storage.delete_chat(cid, db_path)
+    st.session_state.pop("history_saved", None)
+    results["save_to_history"] = turns
+
+    results["search_chats"] = timed(
+        lambda i: storage.search_chats(rng.choice(["python", "latency cache", "question 4", "stream"]), db_path),
+        iterations
+    )
+
+    results.update(run_reruns(rerun_iterations))
+    flush_history_writes()
+
+    report = {name: summarize(timings) for name, timings in results.items()}
+    report["_dataset_build_s"] = round(build_s, 2)
+    return report
+
+
+def run_reruns(repeat: int) -> dict:
+    """Time full script reruns of main.py for a logged-in user: idle, and sending a chat message."""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return {}
+    from benchmarks.fake_groq import FakeGroqServer
+    from benchmarks.datasets import BENCH_USER
+    from assets import storage
+
+    with FakeGroqServer(latency=0.0) as fake:
+        os.environ["API_KEY"] = "benchmark"
+        os.environ["GROQ_BASE_URL"] = fake.base_url
+
+        app = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=120)
+        app.session_state["logged_in_user"] = BENCH_USER
+        app.session_state["logged_in_user_email"] = BENCH_USER
+        app.session_state["logged_in_username"] = BENCH_USER.split("@")[0]
+        app.session_state["page_option"] = "Chat with Bot"
+        app.run()  # warm-up: imports, caches, model construction
+        if app.exception:
+            print(f"rerun benchmark: main.py raised {app.exception[0].value}", file=sys.stderr)
+            return {}
+
+        idle = timed(lambda i: app.run(), repeat)
+        turn = timed(lambda i: app.chat_input[0].set_value(f"benchmark prompt number {i}").run(), repeat)
+
+        cid = app.session_state["cid"] if "cid" in app.session_state else None
+        if cid:
+            from assets.write_behind import flush_history_writes
+            bench_db = storage.user_history_db(BENCH_USER)
+            flush_history_writes(bench_db)
+            storage.delete_chat(cid, bench_db)
+
+    return {"rerun_idle": idle, "rerun_chat_turn": turn}
+
+
+# -------------------- 📊 ORCHESTRATION --------------------
+
+def run_size(size: int, args) -> dict:
+    command = [
+        sys.executable, "-m", "benchmarks.run", "--worker", str(size), "--workdir", args.workdir,
+        "--iterations", str(args.iterations), "--rerun-iterations", str(args.rerun_iterations)
+    ]
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=ROOT))
+    for line in result.stderr.splitlines():
+        if line.startswith("rerun benchmark:"):
+            print(f"[{size} chats] {line}")
+    for line in result.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    raise RuntimeError(f"benchmark worker for {size} chats failed:\n{result.stderr[-2000:]}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    """Return (key, metric, baseline, current) for every figure that regressed beyond tolerance.
+
+    A figure must grow both relatively (``tolerance``) and absolutely (``min_delta_ms``),
+    so timer noise on sub-millisecond benchmarks is not reported.
+    """
+    regressions = []
+    for size, benches in results.items():
+        for name, figures in benches.items():
+            if name.startswith("_"):
+                continue
+            reference = baseline.get(size, {}).get(name)
+            if not reference:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                grown = figures[metric] - reference[metric]
+                if figures[metric] > reference[metric] * (1 + tolerance) and grown > min_delta_ms:
+                    regressions.append((f"{name}[{size}]", metric, reference[metric], figures[metric]))
+    return regressions
+
+
+def print_report(results: dict, baseline: dict):
+    for size, benches in results.items():
+        print(f"\n== {size} chats (dataset built/reused in {benches.get('_dataset_build_s', 0)} s)")
+        print(f"   {'benchmark':<26}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}{'vs base p50':>13}")
+        for name, figures in benches.items():
+            if name.startswith("_"):
+                continue
+            reference = baseline.get(size, {}).get(name)
+            delta = f"{figures['p50_ms'] / reference['p50_ms']:.2f}x" if reference and reference["p50_ms"] else "-"
+            print(f"   {name:<26}{figures['n']:>6}{figures['p50_ms']:>11.3f}{figures['p95_ms']:>11.3f}"
+                  f"{figures['p99_ms']:>11.3f}{figures['max_ms']:>11.3f}{delta:>13}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--rerun-iterations", type=int, default=10)
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="where synthetic datasets are built and kept")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        report = run_worker(args.worker, args.workdir, args.iterations, args.rerun_iterations)
+        print(RESULT_MARKER + json.dumps(report))
+        sys.exit(0)
+
+    results = {str(size): run_size(size, args) for size in args.sizes}
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif baseline:
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        for key, metric, before, after in regressions:
+            print(f"REGRESSION {key} {metric}: {before:.3f} ms -> {after:.3f} ms")
+        sys.exit(1 if regressions else 0)
@@ -1,20 +1,33 @@
 import streamlit as st
+
+# Set Streamlit page configuration (first, so the page shell renders before anything heavy loads)
+st.set_page_config(page_title="Nexa AI", page_icon="🤖", layout="wide")
+
 from assets.auth import load_user_data, render_login, render_signup
 from assets.sidebar import render_sidebar
-from assets.bot import render_bot
+from assets import metrics, profiling
 from dotenv import load_dotenv
 import os
-from langchain_groq import ChatGroq
 
 # Load environment variables
 load_dotenv()
 key = os.getenv("API_KEY")
 
-# Load Chat model
-chat_model = ChatGroq(api_key=key, model_name="deepseek-r1-distill-llama-70b")
+# Opt-in profiling of slow reruns (PROFILE=1, see assets/profiling.py for the other settings)
+profiling.configure()
 
-# Set Streamlit page configuration
-st.set_page_config(page_title="Nexa AI", page_icon="🤖", layout="wide")
+# Optional metrics endpoint / JSON file (METRICS_PORT, METRICS_FILE); started once per process
+metrics.start_exporters()
+
+# Chat model: built on first use of the chat page, then one dispatcher (worker pool +
+# HTTP connection pool) is shared by every session. The LangChain/Groq stack, the bot
+# UI and streamlit_lottie are only imported here, so the Login page never pays for them.
+@st.cache_resource(show_spinner=False)
+def get_chat_model(api_key):
+    from assets.dispatcher import create_dispatcher
+    dispatcher = create_dispatcher(api_key)
+    metrics.register_gauges("nexa_llm_dispatcher", dispatcher.metrics)
+    return dispatcher
 
 # Initialize session state variables
 if "page_option" not in st.session_state:
@@ -22,35 +35,40 @@ if "page_option" not in st.session_state:
 if "logged_in_user" not in st.session_state:
     st.session_state.logged_in_user = None
 
-# Load users
-user_data = load_user_data()
+# Every rerun is timed as a whole and per stage (see assets/metrics.py)
+with metrics.span("rerun"):
+    # Load users
+    with metrics.span("load_users"):
+        user_data = load_user_data()
+
+    # Render sidebar and update navigation state
+    with metrics.span("sidebar"):
+        sidebar_option = render_sidebar()
+    if sidebar_option and sidebar_option != st.session_state.page_option:
+        st.session_state.page_option = sidebar_option
 
-# Render sidebar and update navigation state
-sidebar_option = render_sidebar()
-if sidebar_option and sidebar_option != st.session_state.page_option:
-    st.session_state.page_option = sidebar_option
+    # If logged in, always route to chat
+    if st.session_state.logged_in_user:
+        st.session_state.page_option = "Chat with Bot"
 
-# If logged in, always route to chat
-if st.session_state.logged_in_user:
-    st.session_state.page_option = "Chat with Bot"
+    # Routing Logic
+    match st.session_state.page_option:
+        case "Sign Up":
+            render_signup(user_data)
 
-# Routing Logic
-match st.session_state.page_option:
-    case "Sign Up":
-        render_signup(user_data)
+        case "Login":
+            render_login(user_data)
 
-    case "Login":
-        render_login(user_data)
+        case "Chat with Bot":
+            if not st.session_state.logged_in_user:
+                st.warning("⚠️ Please log in first.")
+                st.session_state.page_option = "Login"
+                st.experimental_rerun()
+            else:
+                from assets.bot import render_bot
+                render_bot(get_chat_model(key))
 
-    case "Chat with Bot":
-        if not st.session_state.logged_in_user:
-            st.warning("⚠️ Please log in first.")
+        case _:
+            st.warning("🔁 Resetting invalid state...")
             st.session_state.page_option = "Login"
             st.experimental_rerun()
-        else:
-            render_bot(chat_model)
-
-    case _:
-        st.warning("🔁 Resetting invalid state...")
-        st.session_state.page_option = "Login"
-        st.experimental_rerun()
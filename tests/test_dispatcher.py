@@ -0,0 +1,156 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from assets import dispatcher as dispatcher_module
+from assets.dispatcher import DispatcherBusy, LLMDispatcher, create_chat_model
+from benchmarks.fake_groq import FakeGroqServer
+
+QUESTION = [HumanMessage(content="What is SQLite WAL mode?")]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(dispatcher_module, "backoff_delay", lambda attempt: 0.0)
+
+
+def make_dispatcher(fake, **options):
+    options.setdefault("timeout", 30)
+    return LLMDispatcher(create_chat_model("fake-key", base_url=fake.base_url), **options)
+
+
+def text_of_stream(dispatcher, messages=QUESTION):
+    return "".join(chunk.content for chunk in dispatcher.stream(messages))
+
+
+def test_identical_concurrent_invokes_share_one_upstream_call():
+    with FakeGroqServer(latency=0.5) as fake:
+        dispatcher = make_dispatcher(fake)
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            replies = list(pool.map(lambda _: dispatcher.invoke(QUESTION), range(6)))
+        dispatcher.shutdown()
+
+    assert fake.requests == 1
+    assert {reply.content for reply in replies} == {fake.answer_for([{"content": QUESTION[0].content}])}
+    assert dispatcher.metrics()["coalesced"] == 5
+
+
+def test_identical_concurrent_streams_replay_the_whole_answer():
+    with FakeGroqServer(latency=0.3, token_delay=0.01) as fake:
+        dispatcher = make_dispatcher(fake)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            texts = list(pool.map(lambda _: text_of_stream(dispatcher), range(4)))
+        dispatcher.shutdown()
+
+    assert fake.requests == 1
+    assert len(set(texts)) == 1 and texts[0].endswith("Fake answer to: What is SQLite WAL mode?")
+
+
+def test_coalescing_can_be_turned_off():
+    with FakeGroqServer(latency=0.3) as fake:
+        dispatcher = make_dispatcher(fake, coalesce=False, per_user=3)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            list(pool.map(lambda _: dispatcher.invoke(QUESTION), range(3)))
+        dispatcher.shutdown()
+
+    assert fake.requests == 3
+
+
+def test_rate_limits_are_retried_then_reported():
+    with FakeGroqServer(latency=0.0, error_rate=1.0, error_status=429) as fake:
+        dispatcher = make_dispatcher(fake, max_retries=2)
+        with pytest.raises(Exception):
+            dispatcher.invoke(QUESTION)
+        dispatcher.shutdown()
+
+    assert fake.requests == 3
+    assert dispatcher.metrics()["retries"] == 2
+    assert dispatcher.metrics()["failed"] == 1
+
+
+def test_client_errors_are_not_retried():
+    with FakeGroqServer(latency=0.0, error_rate=1.0, error_status=400) as fake:
+        dispatcher = make_dispatcher(fake, max_retries=3)
+        with pytest.raises(Exception):
+            dispatcher.invoke(QUESTION)
+        dispatcher.shutdown()
+
+    assert fake.requests == 1
+
+
+class _BlockingModel:
+    """Stub chat model whose calls wait until ``release`` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        self.release.wait(10)
+        return AIMessage(content=f"answer to {messages[-1].content}")
+
+
+def test_user_over_their_limit_is_rejected_at_once():
+    model = _BlockingModel()
+    dispatcher = LLMDispatcher(model, per_user=1, timeout=30)
+    user = dispatcher.for_user("a@example.com")
+    first = threading.Thread(target=user.invoke, args=([HumanMessage(content="first")],))
+    first.start()
+    while not model.calls:
+        time.sleep(0.01)
+
+    started = time.monotonic()
+    with pytest.raises(DispatcherBusy):
+        user.invoke([HumanMessage(content="second")])
+    assert time.monotonic() - started < 1.0
+
+    # Another user is not affected
+    other = threading.Thread(target=dispatcher.for_user("b@example.com").invoke, args=([HumanMessage(content="x")],))
+    other.start()
+    model.release.set()
+    first.join(5)
+    other.join(5)
+    dispatcher.shutdown()
+
+    assert dispatcher._user_calls == {}  # idle users are not kept around
+    assert dispatcher.metrics()["rejected"] == 1
+
+
+class _Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class _SlowStreamingModel:
+    def __init__(self, words):
+        self.words = words
+        self.calls = 0
+
+    def stream(self, messages):
+        self.calls += 1
+        for word in self.words:
+            time.sleep(0.02)
+            yield _Chunk(word)
+
+
+def test_abandoned_stream_is_cancelled_and_later_callers_get_a_full_answer():
+    model = _SlowStreamingModel(["one ", "two ", "three ", "four ", "five"])
+    dispatcher = LLMDispatcher(model, timeout=30)
+
+    reader = dispatcher.stream(QUESTION)
+    assert next(reader).content == "one "
+    reader.close()  # the only reader leaves: the upstream call stops
+
+    assert text_of_stream(dispatcher) == "one two three four five"
+    deadline = time.monotonic() + 5
+    while dispatcher.metrics()["cancelled"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    dispatcher.shutdown()
+
+    assert model.calls == 2
+    assert dispatcher.metrics()["cancelled"] == 1
+    assert dispatcher.metrics()["completed"] == 1
@@ -0,0 +1,52 @@
+import pytest
+
+from assets import storage
+from assets.chat_records import ChatRecord
+
+
+@pytest.fixture
+def history_db(tmp_path, monkeypatch):
+    import streamlit as st
+    monkeypatch.setenv("HISTORY_WRITE_BEHIND", "0")
+    monkeypatch.setattr(storage, "HISTORY_DB", str(tmp_path / "history.db"))
+    st.session_state.clear()
+    yield storage.HISTORY_DB
+    st.session_state.clear()
+
+
+def turn(number):
+    return [ChatRecord("user", f"question {number}"), ChatRecord("ai", f"answer {number}")]
+
+
+def test_save_reports_when_it_creates_the_record(history_db):
+    from assets import bot
+    chat = turn(0)
+    assert bot.save_to_history(chat, "cid_new") is True
+    chat += turn(1)
+    assert bot.save_to_history(chat, "cid_new") is False
+    assert bot.save_to_history(chat, "cid_new") is False  # nothing new
+
+    # A reopened chat continues under a fresh CID: its first save is longer than one turn
+    reopened = chat + turn(2)
+    assert bot.save_to_history(reopened, "cid_reopened") is True
+    assert storage.message_count("cid_reopened", history_db) == 6
+
+
+def test_search_pages_stay_complete_when_the_hit_cap_is_small(history_db, monkeypatch):
+    monkeypatch.setattr(storage, "SEARCH_HITS", 1)
+    for number in range(12):
+        # The first chats have many strong hits, which fill the capped hit list on their own
+        repeats = 20 if number < 3 else 1
+        chat = [{"role": "user", "content": "deploy deploy"} for _ in range(repeats)]
+        chat.append({"role": "ai", "content": f"how to deploy, answer number {number} with more words"})
+        storage.append_messages(f"cid_{number:02d}", f"Chat {number}", "2026-01-01 00:00:00", chat, history_db)
+
+    found, page = [], 0
+    while True:
+        results, has_more = storage.search_chats("deploy", history_db, limit=5, offset=page * 5)
+        found += [result["cid"] for result in results]
+        if not has_more:
+            break
+        page += 1
+    assert sorted(found) == [f"cid_{number:02d}" for number in range(12)]
+    assert len(found) == 12
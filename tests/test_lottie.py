@@ -0,0 +1,19 @@
+import json
+import os
+
+from assets import bot, storage
+
+
+def test_minified_animation_is_served_when_its_copy_cannot_be_written(tmp_path, monkeypatch):
+    asset_path = tmp_path / "welcome.json"
+    asset_path.write_text(json.dumps({"v": "5.7", "w": 1.234567, "meta": {"g": "x"}}), encoding="utf-8")
+
+    def read_only(path, data, **kwargs):
+        raise PermissionError(13, "Read-only file system", path)
+
+    monkeypatch.setattr(storage, "atomic_write_json", read_only)
+    bot._read_lottie.clear()
+    data = bot._read_lottie(str(asset_path), os.stat(asset_path).st_mtime_ns, True)
+
+    assert data == {"v": "5.7", "w": 1.235}
+    assert not (tmp_path / "welcome.min.json").exists()
@@ -0,0 +1,52 @@
+import random
+
+from assets.custom_responses import CUSTOM_RESPONSES
+from assets.matcher import KeywordMatcher, find_custom_response
+
+
+def reference(keywords, text):
+    """Longest keyword that occurs; ties go to the earliest occurrence, then to the first added."""
+    lowered = text.lower()
+    best = None
+    for order, keyword in enumerate(keywords):
+        position = lowered.find(keyword.lower())
+        if keyword and position != -1:
+            candidate = (-len(keyword), position, order, keyword)
+            best = candidate if best is None else min(best, candidate)
+    return best[3] if best else None
+
+
+def test_longest_keyword_wins():
+    matcher = KeywordMatcher(["joke", "gujarati joke", "a"])
+    assert matcher.search("Tell me a Gujarati joke") == "gujarati joke"
+
+
+def test_equal_length_tie_goes_to_earliest_occurrence():
+    matcher = KeywordMatcher(["rain", "song"])
+    assert matcher.search("a song about rain") == "song"
+    assert matcher.search("rain song") == "rain"
+
+
+def test_same_keyword_in_another_case_goes_to_the_first_added():
+    matcher = KeywordMatcher(["Hello", "hello"])
+    assert matcher.search("HELLO there") == "Hello"
+
+
+def test_no_match():
+    assert KeywordMatcher(["shayari"]).search("nothing here") is None
+    assert KeywordMatcher([]).search("anything") is None
+
+
+def test_random_keyword_sets_match_reference():
+    rng = random.Random(11)
+    for _ in range(500):
+        keywords = ["".join(rng.choice("abAB ") for _ in range(rng.randint(1, 5))) for _ in range(rng.randint(1, 8))]
+        text = "".join(rng.choice("abAB ") for _ in range(rng.randint(0, 25)))
+        assert KeywordMatcher(keywords).search(text) == reference(keywords, text), (keywords, text)
+
+
+def test_custom_responses_use_the_most_specific_key():
+    keys = list(CUSTOM_RESPONSES)
+    for key in random.Random(3).sample(keys, min(50, len(keys))):
+        prompt = f"please, {key}!"
+        assert find_custom_response(prompt) == CUSTOM_RESPONSES[reference(keys, prompt)]
@@ -0,0 +1,131 @@
+import pytest
+
+from assets import response_cache
+from assets.response_cache import ResponseCache
+
+
+def ask(text, *earlier):
+    return [{"role": "user", "content": t} for t in earlier] + [{"role": "user", "content": text}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = ResponseCache(max_entries=10)
+    cache.put(ask("What is Python?"), "A language")
+    assert cache.get(ask("what is python")) == ("A language", "exact")
+
+
+def test_similar_prompt_hits_and_unrelated_misses():
+    cache = ResponseCache(max_entries=10, threshold=0.6)
+    cache.put(ask("how do I deploy a streamlit app"), "deploy")
+    cache.put(ask("tell me a joke"), "joke")
+    assert cache.get(ask("how can I deploy a streamlit app")) == ("deploy", "similar")
+    assert cache.get(ask("explain sqlite wal mode")) is None
+
+
+def test_similar_match_requires_the_same_context():
+    cache = ResponseCache(max_entries=10, threshold=0.6, context_turns=1)
+    cache.put(ask("how do I deploy this app to a cloud server", "streamlit"), "streamlit answer")
+    assert cache.get(ask("how do I deploy this app to a cloud server please", "django")) is None
+    assert cache.get(ask("how do I deploy this app to a cloud server please", "streamlit")) == ("streamlit answer", "similar")
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(max_entries=10, ttl=60, threshold=0.6)
+    cache.put(ask("how do I deploy a streamlit app"), "deploy")
+    clock[0] += 59
+    assert cache.get(ask("how do I deploy a streamlit app")) == ("deploy", "exact")
+    clock[0] += 2
+    assert cache.get(ask("how can I deploy a streamlit app")) is None
+    assert cache.get(ask("how do I deploy a streamlit app")) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.put(ask("first question"), "1")
+    cache.put(ask("second question"), "2")
+    assert cache.get(ask("first question"))  # now most recently used
+    cache.put(ask("third question"), "3")
+    assert cache.get(ask("second question")) is None
+    assert cache.get(ask("first question")) == ("1", "exact")
+    assert cache.get(ask("third question")) == ("3", "exact")
+
+
+def test_evicted_slot_no_longer_scores():
+    cache = ResponseCache(max_entries=1, threshold=0.6)
+    cache.put(ask("how do I deploy a streamlit app"), "deploy")
+    cache.put(ask("tell me a joke"), "joke")
+    assert cache.get(ask("how can I deploy a streamlit app")) is None
+    assert cache.get(ask("tell me a joke please")) == ("joke", "similar")
+
+
+def test_deflection_rate_counts_non_model_answers(monkeypatch):
+    monkeypatch.setattr(response_cache, "DEFLECTION_STATS", response_cache.Counter())
+    for source in ("custom", "cache_exact", "llm", "llm"):
+        response_cache.record_answer_source(source)
+    assert response_cache.deflection_rate() == 0.5
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("what is 2+2", "what is 2*2"),
+    ("what is 2+2", "what is 2-2"),
+    ("how do I sort a list in C++", "how do I sort a list in C#"),
+    ("is 5 > 3", "is 5 < 3"),
+])
+def test_operators_and_symbols_tell_prompts_apart(cached, asked):
+    cache = ResponseCache(max_entries=10)
+    cache.put(ask(cached), "answer")
+    assert cache.get(ask(asked)) is None
+    assert cache.get(ask(cached.upper() + "?")) == ("answer", "exact")
+
+
+class StubChatModel:
+    """Offline chat model that streams a fixed answer and counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def stream(self, messages):
+        from langchain_core.messages import AIMessageChunk
+        self.calls += 1
+        for word in f"answer number {self.calls}".split(" "):
+            yield AIMessageChunk(content=word + " ")
+
+
+def chat_page(model):
+    import streamlit as st
+    from assets import bot
+    st.session_state.setdefault("chat_history", [])
+    st.session_state.setdefault("cid", "cid_cache_test")
+    bot.render_main_chat_ui(model)
+
+
+def test_reply_path_answers_a_repeated_question_from_the_cache(tmp_path, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+    from assets import storage
+
+    monkeypatch.setenv("RESPONSE_CACHE", "1")
+    monkeypatch.setenv("HISTORY_WRITE_BEHIND", "0")
+    monkeypatch.setattr(response_cache, "_shared_cache", None)
+    monkeypatch.setattr(storage, "HISTORY_DB", str(tmp_path / "history.db"))
+
+    model = StubChatModel()
+    app = AppTest.from_function(chat_page, args=(model,), default_timeout=30)
+    app.run()
+
+    app.chat_input[0].set_value("How do I read a parquet file with pandas?").run()
+    assert not app.exception
+    assert model.calls == 1  # miss: the model answered and the answer was cached
+
+    app.session_state["chat_history"] = []
+    app.chat_input[0].set_value("how do i read a parquet file with pandas").run()
+    assert not app.exception
+    assert model.calls == 1  # hit: same question, answered without the model
+    assert app.session_state["chat_history"][-1].content == "answer number 1"
@@ -0,0 +1,69 @@
+import random
+import re
+
+import pytest
+
+from assets.streaming import ThinkFilter, stream_visible_text, strip_think
+
+
+def reference(text: str) -> str:
+    """What the UI should show for a complete response."""
+    text = re.sub(r"<think>.*?</think>", "", text, flags=re.S)
+    text = re.sub(r"<think>.*", "", text, flags=re.S)  # unclosed block: the rest is reasoning
+    return text.replace("</think>", "").lstrip()
+
+
+def feed_chunks(chunks) -> str:
+    think_filter = ThinkFilter()
+    return "".join(think_filter.feed(chunk) for chunk in chunks) + think_filter.flush()
+
+
+@pytest.mark.parametrize("text", [
+    "<think>plan</think>\n\nAnswer",
+    "Before <think>hidden</think> after",
+    "no tags at all",
+    "<think>never closed",
+    "stray </think> closing tag",
+    "a <thin b <think>x</think> c </thi d",
+    "",
+])
+def test_every_split_point_gives_the_same_text(text):
+    expected = reference(text)
+    assert feed_chunks([text]) == expected
+    for cut in range(len(text) + 1):
+        assert feed_chunks([text[:cut], text[cut:]]) == expected
+
+
+def test_random_chunking_matches_reference():
+    rng = random.Random(5)
+    pieces = ["<think>", "</think>", "<", "/", "t", "h", "i", "n", "k", ">", "a", " ", "\n", "word"]
+    for _ in range(500):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+        chunks, rest = [], text
+        while rest:
+            size = rng.randint(1, 6)
+            chunks.append(rest[:size])
+            rest = rest[size:]
+        assert feed_chunks(chunks) == reference(text), text
+
+
+def test_strip_think_trims_the_whole_response():
+    assert strip_think("<think>x</think>  Hello  ") == "Hello"
+
+
+class _Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+class _StreamingModel:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def stream(self, messages):
+        return (_Chunk(chunk) for chunk in self.chunks)
+
+
+def test_stream_visible_text_hides_reasoning_across_chunks():
+    model = _StreamingModel(["<thi", "nk>secret</th", "ink>\n\nHel", "lo"])
+    assert "".join(stream_visible_text(model, [])) == "Hello"
@@ -0,0 +1,24 @@
+import logging
+
+from assets import users
+
+
+def test_csv_rows_with_taken_emails_are_logged_not_lost_silently(tmp_path, caplog):
+    csv_path = tmp_path / "users.csv"
+    csv_path.write_text(
+        "username,email,password\n"
+        "alice,shared@example.com,pw1\n"
+        "bob,shared@example.com,pw2\n"
+        "carol,carol@example.com,pw3\n",
+        encoding="utf-8"
+    )
+    db_path = str(tmp_path / "users.db")
+
+    with caplog.at_level(logging.WARNING, logger="assets.users"):
+        imported = users.migrate_users_csv(str(csv_path), db_path)
+
+    assert imported == 2
+    assert users.find_user("shared@example.com", db_path)["username"] == "alice"
+    assert users.find_user("carol", db_path)
+    assert any("'bob'" in message and "'alice'" in message for message in caplog.messages)
+    assert users.migrate_users_csv(str(csv_path), db_path) == 0  # imported once
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from assets import storage
+from assets.write_behind import HistoryWriter
+
+
+def turn(number):
+    return [{"role": "user", "content": f"question {number}"}, {"role": "ai", "content": f"answer {number}"}]
+
+
+def test_flush_waits_only_for_its_own_database(tmp_path):
+    writer = HistoryWriter(flush_interval=0.02)
+    mine, busy = str(tmp_path / "mine" / "history.db"), str(tmp_path / "busy" / "history.db")
+    stop = threading.Event()
+
+    def producer():
+        number = 0
+        while not stop.is_set():
+            writer.submit(busy, "cid_busy", "Busy", "2026-01-01 00:00:00", turn(number))
+            number += 1
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    try:
+        time.sleep(0.2)
+        writer.submit(mine, "cid_mine", "Mine", "2026-01-01 00:00:00", turn(0))
+        started = time.perf_counter()
+        writer.flush(mine)
+        waited = time.perf_counter() - started
+        still_busy = writer.pending(busy)
+    finally:
+        stop.set()
+        thread.join()
+        writer.stop()
+
+    assert storage.message_count("cid_mine", mine) == 2
+    assert still_busy  # the other database never drained, yet this flush returned
+    assert waited < 2
+
+
+def test_flush_does_not_sit_out_the_flush_interval(tmp_path):
+    writer = HistoryWriter(flush_interval=30)
+    db_path = str(tmp_path / "history.db")
+    try:
+        for number in range(3):
+            writer.submit(db_path, "cid_a", "A", "2026-01-01 00:00:00", turn(number))
+            started = time.perf_counter()
+            writer.flush(db_path)
+            assert time.perf_counter() - started < 5
+        assert not writer.pending()
+    finally:
+        writer.stop()
+
+    assert storage.message_count("cid_a", db_path) == 6